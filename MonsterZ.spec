@@ -10,7 +10,8 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # no se usan en el editor: menos módulos que descomprimir al arrancar
+    excludes=['unittest', 'doctest', 'lib2to3', 'tkinter.test', 'test'],
     noarchive=False,
     optimize=0,
 )
@@ -26,7 +27,7 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=False,  # descomprimir con UPX en cada arranque cuesta más de lo que ahorra
     upx_exclude=[],
     runtime_tmpdir=None,
     console=False,
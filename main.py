@@ -7,11 +7,37 @@ Monster Editor avanzado para MU Online
 - Dependencias: ttkbootstrap
 """
 
+import time
+STARTUP_T0 = time.perf_counter()  # inicio del proceso (aprox.): para medir el arranque
+
+import argparse
+import ast
+import cProfile
+import functools
+import hashlib
+import json
+import math
+import mmap
+import os
+import random
 import re
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from heapq import heapify, heappop, heappush
+from itertools import compress
+from operator import mul
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
-import ttkbootstrap as tb
-from ttkbootstrap.constants import *
+from tkinter import ttk, messagebox, scrolledtext, filedialog
+# ttkbootstrap (y Pillow, que arrastra) solo se importa al abrir la ventana:
+# los comandos sin ventana y los procesos de 'batch' arrancan sin él
 
 FILE_PATH = "Monster.txt"
 
@@ -23,8 +49,168 @@ COLUMNS = [
     "ItemRate","MoneyRate","MaxItemLevel","MonsterSkill","Resistance1","Resistance2",
     "Resistance3","Resistance4"
 ]
+# nombre de columna -> posición en COLUMNS
+COL = {name: i for i, name in enumerate(COLUMNS)}
+INDEX_COL = COL["Index"]
+NAME_COL = COL["Name"]
+
+# ---------- métricas ----------
+# Instrumentación opcional (apagada por defecto): tiempos y cantidad de
+# llamadas por operación. Apagada, cada punto instrumentado solo comprueba
+# METRICS.enabled.
+class _Timer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+_NO_TIMER = nullcontext()
+
+class Metrics:
+    """
+    stats[nombre] = [llamadas, total s, máximo s, último s]; counters[nombre]
+    = cantidad acumulada (p.ej. filas leídas). Con tracing también se guarda
+    cada llamada (hasta TRACE_MAX_EVENTS) para exportarla como traza JSON.
+    Se puede usar desde el hilo de I/O.
+    """
+    TRACE_MAX_EVENTS = 100_000
+
+    def __init__(self):
+        self.enabled = False
+        self.tracing = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+            self.counters = {}
+            self.trace = deque(maxlen=self.TRACE_MAX_EVENTS)
+
+    def record(self, name, start, elapsed):
+        with self._lock:
+            s = self.stats.get(name)
+            if s is None:
+                s = self.stats[name] = [0, 0.0, 0.0, 0.0]
+            s[0] += 1
+            s[1] += elapsed
+            if elapsed > s[2]:
+                s[2] = elapsed
+            s[3] = elapsed
+            if self.tracing:
+                self.trace.append((name, start, elapsed, threading.get_ident()))
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def timed(self, name):
+        """with METRICS.timed("nombre"): ... (no hace nada si está apagado)."""
+        return _Timer(self, name) if self.enabled else _NO_TIMER
+
+    def last_ms(self, name):
+        s = self.stats.get(name)
+        return None if s is None else s[3] * 1000
+
+    def snapshot(self):
+        """{"stats": {nombre: {...ms}}, "counters": {...}} listo para JSON."""
+        with self._lock:
+            stats = {name: {"count": n, "total_ms": total * 1000, "mean_ms": total / n * 1000,
+                            "max_ms": peak * 1000, "last_ms": last * 1000}
+                     for name, (n, total, peak, last) in sorted(self.stats.items())}
+            return {"stats": stats, "counters": dict(self.counters)}
+
+    def dump(self, path):
+        """
+        Escribe métricas y traza (formato Trace Event: chrome://tracing o
+        Perfetto). Los ts se miden desde STARTUP_T0, también los de first_paint
+        y los de operaciones que empezaron antes de un reset().
+        """
+        data = self.snapshot()
+        with self._lock:
+            data["traceEvents"] = [
+                {"name": name, "ph": "X", "pid": os.getpid(), "tid": tid,
+                 "ts": (start - STARTUP_T0) * 1e6, "dur": elapsed * 1e6}
+                for name, start, elapsed, tid in self.trace
+            ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+
+METRICS = Metrics()
+
+def instrumented(name):
+    """Decorador: mide cada llamada como la operación name cuando METRICS está activo."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                METRICS.record(name, start, time.perf_counter() - start)
+        return wrapper
+    return decorate
 
 # ---------- UTIL: parse / format ----------
+READ_BUFFER = 1 << 20  # lectura en bloques de 1 MB (no se carga el archivo entero)
+PROGRESS_EVERY = 4096  # líneas entre avisos de progreso / comprobaciones de cancelación
+
+class OperationCancelled(Exception):
+    """La carga o el guardado se canceló (cancel.set()) antes de terminar."""
+
+# problema encontrado al leer una línea (lineno empieza en 1)
+ParseIssue = namedtuple("ParseIssue", "lineno reason line")
+
+class LoadStats(namedtuple("LoadStats", "lines rows issues seconds cached", defaults=(False,))):
+    """Resumen de una carga: líneas leídas, monsters, problemas, tiempo y si vino de la caché."""
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds > 0 else float("inf")
+
+def _parse_data_line(line):
+    """
+    Parsea una línea de datos ya sin espacios en los extremos.
+    Devuelve (fila, motivo): fila es None si la línea no es válida; motivo
+    describe el problema (también cuando la fila se rellena o se recorta).
+    """
+    head, quote, tail = line.partition('"')
+    if not quote:
+        return None, "falta el nombre entre comillas"
+    name, quote, rest = tail.partition('"')
+    if not quote:
+        return None, "falta la comilla de cierre del nombre"
+    head_parts = head.split()
+    if len(head_parts) != 2 or not (head_parts[0].isdecimal() and head_parts[1].isdecimal()):
+        return None, "se esperaba 'Index Rate' (enteros) antes del nombre"
+    rest_parts = rest.split()
+    if not rest_parts:
+        return None, "no hay valores después del nombre"
+
+    row = head_parts + [name] + rest_parts
+    # Ensure the row has same number of columns as COLUMNS (pad with zeros if needed)
+    n = len(COLUMNS)
+    if len(row) < n:
+        reason = f"faltan {n - len(row)} columnas (se rellenan con 0)"
+        row += ["0"] * (n - len(row))
+    elif len(row) > n:
+        reason = f"sobran {len(row) - n} columnas (se ignoran)"
+        row = row[:n]
+    else:
+        reason = None
+    return row, reason
+
 def parse_monster_line(line: str):
     """
     Parsea una línea de monster y devuelve lista de campos o None si no cumple.
@@ -33,87 +219,2278 @@ def parse_monster_line(line: str):
     line = line.strip()
     if not line or line.startswith("//") or line.lower().startswith("end"):
         return None
+    return _parse_data_line(line)[0]
+
+def iter_monster_lines(lines, reuse=None):
+    """
+    Generador sobre un iterable de líneas (p.ej. el archivo abierto).
+    Produce (lineno, texto, fila, motivo): fila es la lista de campos si la
+    línea es un monster (None para comentarios, vacías, 'end' o inválidas) y
+    motivo el problema encontrado, si lo hay.
+    reuse(texto) puede devolver algo distinto de None para una línea ya
+    conocida; se entrega como fila en lugar de parsear la línea.
+    """
+    for lineno, ln in enumerate(lines, 1):
+        text = ln.rstrip("\n")
+        if reuse is not None:
+            row = reuse(text)
+            if row is not None:
+                yield lineno, text, row, None
+                continue
+        stripped = text.strip()
+        if not stripped or stripped.startswith("//") or stripped[:3].lower() == "end":
+            yield lineno, text, None, None
+            continue
+        row, reason = _parse_data_line(stripped)
+        yield lineno, text, row, reason
+
+def format_monster_line(row):
+    """Formatea una fila (lista) a línea para guardar en el archivo"""
+    # Name in quotes, align spaces similar to original
+    name = f"\"{row[2]}\""
+    left = f"{row[0]:<8}{row[1]:<8}{name:<35}"
+    right = " ".join(str(x) for x in row[3:])
+    return left + right
+
+# ---------- tabla columnar ----------
+def _scale_text(text, factor):
+    """
+    Aplica factor a un valor guardado como texto. Devuelve el nuevo texto o
+    None si no es numérico. Enteros quedan enteros; decimales con 2 decimales.
+    """
+    try:
+        val = float(text)
+        newval = val * factor
+        if float(int(val)) == val:
+            return str(int(round(newval)))
+        return f"{newval:.2f}"
+    except (ValueError, OverflowError):
+        return None
+
+def _int_key(key):
+    try:
+        return int(key)
+    except ValueError:
+        return None
+
+class IndexMap:
+    """
+    Index (texto) -> fila viva, siempre al día (O(1) para buscar, agregar y
+    quitar). Los Index repetidos se guardan aparte en dups; el máximo para
+    asignar Index nuevos se mantiene con un heap con borrado perezoso.
+    """
+
+    def __init__(self, pairs=()):
+        self.rows = {}     # Index -> fila (la de menor id si está repetido)
+        self.dups = {}     # Index repetido -> set(filas)
+        self.counts = {}   # valor entero de Index -> cuántas filas lo usan
+        for key, row in pairs:
+            self.add(row, key, push=False)
+        self.heap = [-n for n in self.counts]
+        heapify(self.heap)
+
+    def add(self, row, key, push=True):
+        first = self.rows.setdefault(key, row)
+        if first != row:
+            self.dups.setdefault(key, {first}).add(row)
+            self.rows[key] = min(first, row)
+        n = _int_key(key)
+        if n is not None:
+            count = self.counts.get(n, 0)
+            self.counts[n] = count + 1
+            if push and count == 0:
+                heappush(self.heap, -n)
+
+    def remove(self, row, key):
+        dup = self.dups.get(key)
+        if dup is not None:
+            dup.discard(row)
+            self.rows[key] = min(dup)
+            if len(dup) == 1:
+                del self.dups[key]
+        elif self.rows.get(key) == row:
+            del self.rows[key]
+        n = _int_key(key)
+        if n is not None and n in self.counts:
+            self.counts[n] -= 1
+            if not self.counts[n]:
+                del self.counts[n]
+
+    def move(self, row, old, new):
+        if old != new:
+            self.remove(row, old)
+            self.add(row, new)
+
+    def row(self, key):
+        return self.rows.get(key)
+
+    def next_free(self):
+        heap = self.heap
+        while heap and -heap[0] not in self.counts:
+            heappop(heap)
+        return -heap[0] + 1 if heap else 0
+
+    def duplicates(self):
+        return {key: sorted(rows) for key, rows in self.dups.items()}
+
+class MonsterTable:
+    """
+    Monsters guardados por columnas (una entrada por columna de COLUMNS).
+    Las columnas cuyos valores son todos enteros se guardan como array('q');
+    Name y cualquier columna con valores no enteros quedan como lista de str.
+    Las filas se siguen pudiendo leer como lista de strings (table[i]).
+
+    source[i] guarda la línea original del archivo; se pone a None cuando la
+    fila se modifica (fila "sucia"), y solo esas se vuelven a formatear al guardar.
+
+    Cada fila tiene un id estable (su posición): eliminar solo la marca como
+    muerta en alive (O(1)), así selección e índices no se desplazan. Las
+    filas muertas no se guardan ni se muestran.
+    """
+
+    def __init__(self):
+        self.columns = [array("q") for _ in COLUMNS]
+        self.columns[NAME_COL] = []
+        self.source = []
+        self.alive = bytearray()  # 1 = fila viva, 0 = eliminada
+        self.dead = 0
+        self.version = 0  # se incrementa en cada modificación
+        self.issues = []  # ParseIssue encontrados al cargar
+        self.stats = None  # LoadStats de la carga
+        self._log = None  # cambios primitivos mientras EditHistory graba una operación
+        self._index_map = None  # IndexMap, se crea al primer uso
+        # líneas entre monsters que no son monsters (inválidas, comentarios): {fila: [líneas]}
+        # se guardan tal cual justo antes de esa fila (fila == cantidad cargada: tras la última)
+        self.passthrough = {}
+        self.final_newline = True  # False si el archivo cargado no terminaba en salto de línea
+
+    @classmethod
+    def from_rows(cls, rows, source=None):
+        table = cls()
+        table.source = list(source) if source is not None else [None] * len(rows)
+        table.alive = bytearray(b"\x01" * len(rows))
+        if not rows:
+            return table
+        for ci, texts in enumerate(zip(*rows)):
+            texts = list(texts)
+            table.columns[ci] = cls._typed_column(texts) if ci != NAME_COL else texts
+        return table
+
+    @classmethod
+    def from_base(cls, base, rows, source):
+        """
+        Como from_rows, pero rows mezcla filas parseadas con ids de filas de
+        base (int) cuyos valores se copian por columnas, sin convertirlos de nuevo.
+        """
+        new_rows, picks, n = [], [], len(base)
+        for row in rows:
+            if isinstance(row, int):
+                picks.append(row)
+            else:
+                picks.append(n + len(new_rows))
+                new_rows.append(row)
+        table = cls()
+        table.source = list(source)
+        table.alive = bytearray(b"\x01" * len(picks))
+        for ci, base_col in enumerate(base.columns):
+            texts = [row[ci] for row in new_rows]
+            if isinstance(base_col, array):
+                new_col = cls._typed_column(texts)
+                if isinstance(new_col, array):
+                    table.columns[ci] = array("q", map((base_col + new_col).__getitem__, picks))
+                    continue
+                base_col = list(map(str, base_col))
+            gathered = list(map((base_col + texts).__getitem__, picks))
+            table.columns[ci] = gathered if ci == NAME_COL else cls._typed_column(gathered)
+        return table
+
+    @staticmethod
+    def _typed_column(texts):
+        """array('q') si todos los textos son enteros que se reescriben igual; si no, la lista."""
+        try:
+            ints = array("q", map(int, texts))
+        except (ValueError, OverflowError):
+            return texts
+        if list(map(str, ints)) != texts:
+            return texts  # p.ej. "007" o "+5": se conserva el texto tal cual
+        return ints
+
+    def is_int_column(self, ci):
+        return isinstance(self.columns[ci], array)
+
+    def _demote(self, ci):
+        """Pasa una columna entera a lista de str (cuando recibe un valor no entero)."""
+        self.columns[ci] = [str(v) for v in self.columns[ci]]
+
+    # ----- acceso por fila -----
+    def __len__(self):
+        """Cantidad de ids de fila (incluye las eliminadas; ver live_count)."""
+        return len(self.columns[0])
+
+    def live_count(self):
+        return len(self) - self.dead
+
+    def is_alive(self, i):
+        return self.alive[i] == 1
+
+    def live_rows(self):
+        """Ids de las filas vivas, en orden."""
+        if not self.dead:
+            return range(len(self))
+        return list(compress(range(len(self)), self.alive))
+
+    def __getitem__(self, i):
+        return [str(col[i]) for col in self.columns]
+
+    def __iter__(self):
+        """Filas vivas como listas de strings."""
+        for vals, alive in zip(zip(*self.columns), self.alive):
+            if alive:
+                yield [str(v) for v in vals]
+
+    def cell(self, i, ci):
+        return str(self.columns[ci][i])
+
+    def _assign(self, i, ci, text):
+        """Escribe una celda (texto) respetando el tipo de la columna, sin marcarla ni registrarla."""
+        col = self.columns[ci]
+        if ci == INDEX_COL and self._index_map is not None and self.alive[i]:
+            self._index_map.move(i, str(col[i]), text)
+        if isinstance(col, array):
+            try:
+                val = int(text)
+            except ValueError:
+                val = None
+            if val is not None and str(val) == text:
+                col[i] = val
+                return
+            self._demote(ci)
+            col = self.columns[ci]
+        col[i] = text
+
+    def _assign_many(self, ci, rows, values):
+        col = self.columns[ci]
+        if isinstance(col, array) and isinstance(values, array) and ci != INDEX_COL:
+            for i, v in zip(rows, values):
+                col[i] = v
+        else:
+            for i, v in zip(rows, values):
+                self._assign(i, ci, str(v))
+
+    def set_cell(self, i, ci, text):
+        old = str(self.columns[ci][i])
+        if old == text:
+            return
+        self._touch(i)
+        if self._log is not None:
+            self._log.append(("cell", i, ci, old, text))
+        self._assign(i, ci, text)
+
+    def set_row(self, i, values):
+        for ci, text in enumerate(values):
+            self.set_cell(i, ci, text)
+
+    def append_row(self, values):
+        """Agrega una fila al final y devuelve su id."""
+        i = len(self)
+        for col in self.columns:
+            col.append(0 if isinstance(col, array) else "")
+        self.source.append(None)
+        self.alive.append(0)
+        self.dead += 1
+        for ci, text in enumerate(values):
+            self._assign(i, ci, text)
+        self._revive(i)
+        if self._log is not None:
+            self._log.append(("insert", i))
+        return i
+
+    def delete_row(self, i):
+        """Elimina la fila i en O(1): queda muerta, los demás ids no cambian."""
+        if not self.alive[i]:
+            return
+        self._kill(i)
+        if self._log is not None:
+            self._log.append(("delete", i))
+
+    def _kill(self, i):
+        self.alive[i] = 0
+        self.dead += 1
+        self.version += 1
+        if self._index_map is not None:
+            self._index_map.remove(i, self.cell(i, INDEX_COL))
+
+    def _revive(self, i):
+        self.alive[i] = 1
+        self.dead -= 1
+        self.version += 1
+        if self._index_map is not None:
+            self._index_map.add(i, self.cell(i, INDEX_COL))
+
+    # ----- Index -> fila -----
+    def index_map(self):
+        if self._index_map is None:
+            col = self.columns[INDEX_COL]
+            self._index_map = IndexMap((str(col[i]), i) for i in self.live_rows())
+        return self._index_map
+
+    def row_for_index(self, index):
+        """Fila viva con ese Index (texto), o None. O(1)."""
+        return self.index_map().row(str(index))
+
+    def next_index(self):
+        """Index libre para un monster nuevo (máximo + 1)."""
+        return self.index_map().next_free()
+
+    def duplicate_indexes(self):
+        """{Index: [filas]} de los Index repetidos."""
+        return self.index_map().duplicates()
+
+    # ----- filas sucias / líneas para guardar -----
+    def _touch(self, i):
+        if self.source[i] is not None:
+            if self._log is not None:
+                self._log.append(("src", i, self.source[i]))
+            self.source[i] = None
+        self.version += 1
+
+    def _touch_many(self, rows):
+        source = self.source
+        newly = [i for i in rows if source[i] is not None]
+        if self._log is not None and newly:
+            self._log.append(("srcs", array("l", newly), [source[i] for i in newly]))
+        for i in newly:
+            source[i] = None
+        self.version += 1
+
+    def dirty_count(self):
+        if not self.dead:
+            return self.source.count(None)
+        return sum(1 for line, alive in zip(self.source, self.alive) if alive and line is None)
+
+    def mark_saved(self, rendered):
+        """
+        Tras guardar: las líneas reformateadas pasan a ser la fuente de esas filas.
+        Si la fila cambió mientras se guardaba (guardado en segundo plano) sigue sucia.
+        """
+        for i, line in rendered.items():
+            if i < len(self) and self.alive[i] and self.source[i] is None and format_monster_line(self[i]) == line:
+                self.source[i] = line
+
+    def adopt_line(self, i, line):
+        """La fila ya coincide con line (p.ej. la versión en disco): deja de estar sucia."""
+        if self._log is not None:
+            self._log.append(("src", i, self.source[i]))
+        self.source[i] = line
+
+    def copy(self):
+        """Copia independiente (p.ej. para guardarla desde otro hilo)."""
+        other = MonsterTable()
+        other.columns = [col[:] for col in self.columns]
+        other.source = self.source[:]
+        other.alive = self.alive[:]
+        other.dead = self.dead
+        other.version = self.version
+        other.issues = self.issues
+        other.stats = self.stats
+        other.passthrough = self.passthrough
+        other.final_newline = self.final_newline
+        return other
+
+    # ----- deshacer / rehacer -----
+    def apply_log(self, log, undo):
+        """
+        Deshace (undo=True) o rehace una lista de cambios registrados en _log.
+        Devuelve (filas, columnas); columnas es None si hubo altas o bajas.
+        """
+        prev_log, self._log = self._log, None
+        rows, cols = set(), set()
+        structural = False
+        source = self.source
+        # toda celda restaurada deja la fila sucia (el archivo puede tener otro
+        # valor si se guardó entre medias); las líneas originales de "src" se
+        # reponen al final, cuando la fila vuelve a estar como en esa línea
+        restores = []
+        for entry in (reversed(log) if undo else log):
+            kind = entry[0]
+            if kind == "cell":
+                _, i, ci, old, new = entry
+                self._assign(i, ci, old if undo else new)
+                source[i] = None
+                rows.add(i)
+                cols.add(ci)
+            elif kind == "cells":
+                _, ci, idx, old, new = entry
+                self._assign_many(ci, idx, old if undo else new)
+                for i in idx:
+                    source[i] = None
+                rows.update(idx)
+                cols.add(ci)
+            elif kind == "src":
+                restores.append(((entry[1],), (entry[2],)))
+            elif kind == "srcs":
+                restores.append((entry[1], entry[2]))
+            else:
+                # altas y bajas solo cambian alive: la fila conserva sus datos
+                if (kind == "insert") == undo:
+                    self._kill(entry[1])
+                else:
+                    self._revive(entry[1])
+                rows.add(entry[1])
+                structural = True
+        for idx, lines in restores:
+            for i, line in zip(idx, lines):
+                source[i] = line if undo else None
+        self._log = prev_log
+        self.version += 1
+        return rows, (None if structural else cols)
+
+    # ----- operaciones masivas -----
+    def scale_columns(self, rows, col_indices, factor):
+        """
+        Multiplica por factor las columnas indicadas en las filas dadas
+        (None = todas). Devuelve cuántas filas cambiaron.
+        Las columnas enteras se procesan de una vez por columna; las de texto
+        conservan la regla original (entero -> entero, decimal -> 2 decimales).
+        Los valores nuevos de todas las columnas se calculan antes de escribir
+        nada: un error no deja columnas a medio escalar.
+        """
+        if not math.isfinite(factor):
+            raise ValueError(f"factor no válido: {factor}")
+        n = len(self)
+        if rows is None and self.dead:
+            rows = self.live_rows()
+        row_list = range(n) if rows is None else rows
+        touched = bytearray(n)
+        any_int = False
+        plans = []
+        for ci in col_indices:
+            if ci == NAME_COL:
+                continue
+            col = self.columns[ci]
+            if isinstance(col, array):
+                any_int = True
+                try:
+                    vals = [round(v * factor) for v in col] if rows is None else [round(col[i] * factor) for i in rows]
+                    plans.append((ci, array("q", vals)))
+                except OverflowError:
+                    # no cabe en 64 bits (o el producto es infinito): regla de las columnas de
+                    # texto, las celdas sin resultado se saltan y la columna pasa a texto
+                    plans.append((ci, [_scale_text(str(col[i]), factor) for i in row_list]))
+            else:
+                plans.append((ci, [_scale_text(col[i], factor) for i in row_list]))
+
+        for ci, new in plans:
+            col = self.columns[ci]
+            if isinstance(col, array) and isinstance(new, array):
+                if rows is None:
+                    changed = [i for i, (a, b) in enumerate(zip(col, new)) if a != b]
+                    old_vals = array("q", [col[i] for i in changed])
+                    self.columns[ci] = new
+                    new_vals = array("q", [new[i] for i in changed])
+                else:
+                    changed, old_vals, new_vals = [], array("q"), array("q")
+                    for i, v in zip(rows, new):
+                        if col[i] != v:
+                            changed.append(i)
+                            old_vals.append(col[i])
+                            new_vals.append(v)
+                            col[i] = v
+            else:
+                if isinstance(col, array) and any(v is not None for v in new):
+                    self._demote(ci)
+                    col = self.columns[ci]
+                changed, old_vals, new_vals = [], [], []
+                for i, newstr in zip(row_list, new):
+                    if newstr is not None:
+                        touched[i] = 1
+                        if newstr != col[i]:
+                            changed.append(i)
+                            old_vals.append(col[i])
+                            new_vals.append(newstr)
+                            col[i] = newstr
+            if changed:
+                self._touch_many(changed)
+                if self._log is not None:
+                    self._log.append(("cells", ci, array("l", changed), old_vals, new_vals))
+                if ci == INDEX_COL:
+                    self._index_map = None  # se reconstruye al próximo uso
+        self.version += 1
+        if any_int:
+            return len(row_list)
+        return touched.count(1)
+
+    def write_column(self, ci, rows, values):
+        """
+        Escribe values (números o textos) en la columna ci para las filas dadas,
+        como un único cambio deshacible. Devuelve las filas que cambiaron.
+        """
+        col = self.columns[ci]
+        if isinstance(col, array) and ci != INDEX_COL and all(type(v) is int for v in values):
+            changed, old_vals, new_vals = [], array("q"), array("q")
+            for i, v in zip(rows, values):
+                if col[i] != v:
+                    changed.append(i)
+                    old_vals.append(col[i])
+                    new_vals.append(v)
+                    col[i] = v
+        else:
+            changed, old_vals, new_vals = [], [], []
+            for i, v in zip(rows, values):
+                old, new = self.cell(i, ci), str(v)
+                if old != new:
+                    changed.append(i)
+                    old_vals.append(old)
+                    new_vals.append(new)
+                    self._assign(i, ci, new)
+        if changed:
+            self._touch_many(changed)
+            if self._log is not None:
+                self._log.append(("cells", ci, array("l", changed), old_vals, new_vals))
+        self.version += 1
+        return changed
+
+def _known_lines(base):
+    """Función texto -> id de la fila de base con esa línea original (o None)."""
+    return {line: i for i, line in enumerate(base.source) if line is not None and base.alive[i]}.get
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) in (b"\n", b"\r")
+
+@instrumented("load")
+def load_file(path=FILE_PATH, progress=None, cancel=None, base=None):
+    """
+    Carga el archivo línea a línea, devuelve (header_lines, MonsterTable, footer_lines).
+    Los problemas de parseo quedan en table.issues (con número de línea) y
+    las estadísticas de la carga en table.stats.
+    progress(fracción) y cancel (threading.Event) son opcionales, para usarla
+    desde un hilo; si cancel se activa se lanza OperationCancelled.
+    base: tabla de una carga anterior del mismo archivo; las líneas que siguen
+    igual toman sus valores de ahí y solo se parsean las que cambiaron.
+    """
+    start = time.perf_counter()
+    reuse = _known_lines(base) if base is not None else None
+    total = max(1, os.path.getsize(path)) if progress else 1
+    done = 0
+    header = []
+    monsters = []
+    source = []
+    footer = []
+    passthrough = {}
+    issues = []
+    nlines = 0
+    in_monsters = True
+    with open(path, "r", encoding="utf-8", buffering=READ_BUFFER) as f:
+        for lineno, text, row, reason in iter_monster_lines(f, reuse):
+            nlines = lineno
+            if progress:
+                done += len(text) + 1
+            if lineno % PROGRESS_EVERY == 0:
+                if cancel is not None and cancel.is_set():
+                    raise OperationCancelled()
+                if progress:
+                    progress(min(1.0, done / total))
+            if reason:
+                issues.append(ParseIssue(lineno, reason, text))
+            if row is not None:
+                monsters.append(row)
+                source.append(text)
+            elif text.strip().lower() == "end":
+                footer.append(text)
+                in_monsters = False
+            elif in_monsters and monsters:
+                # entre monsters (p.ej. una línea inválida): se queda en su lugar al guardar
+                passthrough.setdefault(len(monsters), []).append(text)
+            elif in_monsters:
+                # if it's non-data and we haven't reached "end", treat as header
+                header.append(text)
+            else:
+                footer.append(text)
+
+    if base is None:
+        table = MonsterTable.from_rows(monsters, source)
+    else:
+        table = MonsterTable.from_base(base, monsters, source)
+    table.issues = issues
+    table.passthrough = passthrough
+    table.final_newline = _ends_with_newline(path)
+    table.stats = LoadStats(nlines, len(monsters), len(issues), time.perf_counter() - start)
+    if METRICS.enabled:
+        METRICS.count("filas leídas", len(monsters))
+    return header, table, footer
+
+# permisos de un archivo nuevo como los de open(path, "w"); la umask se lee al
+# importar (cambiarla para leerla no es seguro con el guardado en segundo plano)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+NEW_FILE_MODE = 0o666 & ~_UMASK
+
+@instrumented("save")
+def save_file(monsters, header, footer, path=FILE_PATH, progress=None, cancel=None):
+    """
+    Guarda todo preservando header/footer. Las filas sin cambios se copian tal
+    cual del original; solo las modificadas se formatean. Se escribe a un
+    temporal en la misma carpeta, fsync y os.replace: el archivo nunca queda
+    a medio escribir (tampoco si se cancela). Devuelve {fila: línea} de las
+    filas reformateadas.
+    """
+    rendered = {}
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            # write header lines (or a standard header if none)
+            if header:
+                for h in header:
+                    f.write(h + "\n")
+            else:
+                f.write("//Index   Rate   Name                                 Level ...\n")
+
+            source = monsters.source
+            alive = monsters.alive
+            passthrough = monsters.passthrough
+            total = len(monsters)
+            for i in range(total):
+                if i % PROGRESS_EVERY == 0 and i:
+                    if cancel is not None and cancel.is_set():
+                        raise OperationCancelled()
+                    if progress:
+                        progress(i / total)
+                if passthrough and i in passthrough:
+                    for extra in passthrough[i]:
+                        f.write(extra + "\n")
+                if not alive[i]:
+                    continue  # eliminada
+                line = source[i]
+                if line is None:
+                    line = rendered[i] = format_monster_line(monsters[i])
+                f.write(line + "\n")
+            for extra in passthrough.get(total, ()):
+                f.write(extra + "\n")
+
+            # write footer if exists, else write 'end'
+            footer = footer or ["end"]
+            for ft in footer[:-1]:
+                f.write(ft + "\n")
+            # el salto final solo si el archivo cargado lo tenía
+            f.write(footer[-1] + ("\n" if monsters.final_newline else ""))
+
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        else:
+            os.chmod(tmp_path, NEW_FILE_MODE)  # mkstemp crea el temporal solo para el dueño (0600)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return rendered
+
+# ---------- caché binaria ----------
+# Monster.txt.cache: copia columnar del archivo ya parseado. Se usa mientras
+# el .txt no cambie (tamaño + mtime, o tamaño + hash si solo cambió el mtime)
+# y se regenera sola en caso contrario. Formato (little/big según byteorder):
+#   cabecera _CACHE_HEAD, luego secciones (tipo, cantidad, bytes) + datos.
+#   Columnas enteras = bytes crudos de array('q'); textos = utf-8 unidos por \n.
+CACHE_ENABLED = True
+CACHE_SUFFIX = ".cache"
+_CACHE_MAGIC = b"MZC1"
+_CACHE_VERSION = 3
+_CACHE_HEAD = struct.Struct("<4sHBHQQq32s")  # magic, versión, byteorder, ncols, nrows, tamaño, mtime_ns, hash
+_CACHE_SECTION = struct.Struct("<cQQ")        # tipo (b"q" / b"s"), cantidad, bytes
+
+def cache_path_for(path):
+    return path + CACHE_SUFFIX
+
+def _file_digest(path):
+    h = hashlib.blake2b(digest_size=32)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_BUFFER), b""):
+            h.update(chunk)
+    return h.digest()
+
+def _pack_texts(texts):
+    data = "\n".join(texts).encode("utf-8")
+    return _CACHE_SECTION.pack(b"s", len(texts), len(data)) + data
+
+def write_cache(path, header, table, footer, size, mtime_ns, digest):
+    """Escribe la caché de forma atómica. Devuelve False si no se pudo (p.ej. carpeta de solo lectura)."""
+    parts = [_CACHE_HEAD.pack(_CACHE_MAGIC, _CACHE_VERSION, sys.byteorder == "little",
+                              len(COLUMNS), len(table), size, mtime_ns, digest)]
+    for col in table.columns:
+        if isinstance(col, array):
+            data = col.tobytes()
+            parts.append(_CACHE_SECTION.pack(b"q", len(col), len(data)) + data)
+        else:
+            parts.append(_pack_texts(col))
+    parts.append(_pack_texts(header))
+    parts.append(_pack_texts(footer))
+    parts.append(_pack_texts(table.source))
+    parts.append(_pack_texts([f"{p.lineno}\t{p.reason}\t{p.line}" for p in table.issues]))
+    parts.append(_pack_texts([str(table.stats.lines if table.stats else 0), str(int(table.final_newline))]))
+    parts.append(_pack_texts([f"{row}\t{line}" for row, lines in table.passthrough.items() for line in lines]))
+
+    cache = cache_path_for(path)
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(cache)), suffix=".tmp")
+    except OSError:
+        return False
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"".join(parts))
+        os.replace(tmp_path, cache)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+    return True
+
+def read_cache(path, size, mtime_ns):
+    """
+    Lee la caché de path si corresponde al archivo actual (tamaño y mtime, o
+    tamaño y hash). Devuelve (header, table, footer) o None si no sirve.
+    """
+    cache = cache_path_for(path)
+    try:
+        with open(cache, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if len(mm) < _CACHE_HEAD.size:
+                return None
+            magic, version, little, ncols, nrows, c_size, c_mtime, digest = _CACHE_HEAD.unpack_from(mm, 0)
+            if magic != _CACHE_MAGIC or version != _CACHE_VERSION or ncols != len(COLUMNS) or c_size != size:
+                return None
+            if c_mtime != mtime_ns and _file_digest(path) != digest:
+                return None
+
+            swap = bool(little) != (sys.byteorder == "little")
+            offset = _CACHE_HEAD.size
+            sections = []
+            while offset < len(mm):
+                kind, count, nbytes = _CACHE_SECTION.unpack_from(mm, offset)
+                offset += _CACHE_SECTION.size
+                data = mm[offset:offset + nbytes]
+                offset += nbytes
+                if kind == b"q":
+                    col = array("q")
+                    col.frombytes(data)
+                    if swap:
+                        col.byteswap()
+                    sections.append(col)
+                else:
+                    sections.append(data.decode("utf-8").split("\n") if count else [])
+    except (OSError, ValueError, struct.error, UnicodeDecodeError):
+        return None
 
-    # regex: index rate "Name" then the rest of fields separated by spaces
-    m = re.match(r'^\s*(\d+)\s+(\d+)\s+"([^"]+)"\s+(.*)$', line)
-    if not m:
+    if len(sections) != len(COLUMNS) + 6:
         return None
+    table = MonsterTable()
+    table.columns = sections[:len(COLUMNS)]
+    table.alive = bytearray(b"\x01" * nrows)
+    header, footer, table.source, raw_issues, (nlines, final_newline), raw_passthrough = sections[len(COLUMNS):]
+    table.final_newline = final_newline == "1"
+    for raw in raw_issues:
+        lineno, reason, line = raw.split("\t", 2)
+        table.issues.append(ParseIssue(int(lineno), reason, line))
+    for raw in raw_passthrough:
+        row, line = raw.split("\t", 1)
+        table.passthrough.setdefault(int(row), []).append(line)
+    table.stats = LoadStats(int(nlines), nrows, len(table.issues), 0.0, cached=True)
+    return header, table, footer
+
+@instrumented("load_cached")
+def load_file_cached(path=FILE_PATH, progress=None, cancel=None):
+    """Como load_file, pero usando/regenerando la caché binaria junto al archivo."""
+    if not CACHE_ENABLED:
+        return load_file(path, progress, cancel)
+    start = time.perf_counter()
+    st = os.stat(path)
+    cached = read_cache(path, st.st_size, st.st_mtime_ns)
+    if cached is not None:
+        header, table, footer = cached
+        table.stats = table.stats._replace(seconds=time.perf_counter() - start)
+        return header, table, footer
+
+    digest = _file_digest(path)
+    header, table, footer = load_file(path, progress, cancel)
+    write_cache(path, header, table, footer, st.st_size, st.st_mtime_ns, digest)
+    return header, table, footer
+
+# ---------- deshacer / rehacer ----------
+UNDO_MAX_OPS = 200
+UNDO_MAX_CELLS = 2_000_000  # celdas guardadas entre deshacer y rehacer
+
+UndoOperation = namedtuple("UndoOperation", "label log cells")
+
+def _log_cells(log):
+    cells = 0
+    for entry in log:
+        if entry[0] == "cell":
+            cells += 1
+        elif entry[0] == "cells":
+            cells += len(entry[2])
+        elif entry[0] in ("insert", "delete"):
+            cells += 1
+        elif entry[0] == "src":
+            cells += len(COLUMNS)  # una línea original pesa como una fila entera de celdas
+        elif entry[0] == "srcs":
+            cells += len(COLUMNS) * len(entry[1])
+    return cells
+
+class EditHistory:
+    """
+    Historial deshacer/rehacer. Cada operación guarda solo los cambios que
+    hizo (celdas viejas/nuevas por columna, altas y bajas de filas), así que
+    deshacer o rehacer cuesta O(celdas cambiadas); la memoria queda acotada
+    por max_ops operaciones y max_cells celdas (se descartan las más viejas).
+    """
+
+    def __init__(self, max_ops=UNDO_MAX_OPS, max_cells=UNDO_MAX_CELLS):
+        self.max_ops = max_ops
+        self.max_cells = max_cells
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.cells = 0
+
+    @contextmanager
+    def record(self, table, label):
+        """Registra como una sola operación los cambios hechos a table dentro del with."""
+        log = table._log = []
+        try:
+            yield
+        finally:
+            table._log = None
+            if log:
+                self._push(UndoOperation(label, log, _log_cells(log)))
+
+    def _push(self, op):
+        for old in self.redo_stack:
+            self.cells -= old.cells
+        self.redo_stack.clear()
+        self.undo_stack.append(op)
+        self.cells += op.cells
+        while len(self.undo_stack) > 1 and (len(self.undo_stack) > self.max_ops or self.cells > self.max_cells):
+            self.cells -= self.undo_stack.popleft().cells
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.cells = 0
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self, table):
+        """Deshace la última operación. Devuelve (etiqueta, (filas, columnas, eventos))."""
+        op = self.undo_stack.pop()
+        self.redo_stack.append(op)
+        return op.label, table.apply_log(op.log, undo=True)
+
+    def redo(self, table):
+        op = self.redo_stack.pop()
+        self.undo_stack.append(op)
+        return op.label, table.apply_log(op.log, undo=False)
+
+# ---------- selección ----------
+class SelectionModel:
+    """
+    Selección de monsters guardada como bitset (un byte 0/1 por fila), sin
+    depender de ningún widget. Las operaciones masivas (todo / nada / invertir)
+    se hacen como operaciones de bits sobre el array completo, opcionalmente
+    limitadas por una máscara (p.ej. las filas que pasan el filtro de búsqueda).
+    """
+
+    def __init__(self, size=0):
+        self.bits = bytearray(size)
+
+    def __len__(self):
+        return len(self.bits)
+
+    @staticmethod
+    def mask_for(rows, size):
+        """Construye una máscara (bytearray 0/1) con las filas indicadas."""
+        mask = bytearray(size)
+        for r in rows:
+            mask[r] = 1
+        return mask
+
+    def reset(self, size):
+        self.bits = bytearray(size)
+
+    # ----- filas individuales -----
+    def is_selected(self, row):
+        return self.bits[row] == 1
+
+    def toggle(self, row):
+        self.bits[row] ^= 1
+
+    def set(self, row, value=True):
+        self.bits[row] = 1 if value else 0
+
+    def append(self, value=False):
+        self.bits.append(1 if value else 0)
+
+    # ----- operaciones masivas -----
+    def _combine(self, mask, op):
+        n = len(self.bits)
+        a = int.from_bytes(self.bits, "little")
+        m = int.from_bytes(mask, "little")
+        self.bits = bytearray(op(a, m).to_bytes(n, "little"))
+
+    def select_all(self, mask=None):
+        if mask is None:
+            self.bits = bytearray(b"\x01" * len(self.bits))
+        else:
+            self._combine(mask, lambda a, m: a | m)
+
+    def clear(self, mask=None):
+        if mask is None:
+            self.bits = bytearray(len(self.bits))
+        else:
+            self._combine(mask, lambda a, m: a & ~m)
+
+    def invert(self, mask=None):
+        if mask is None:
+            mask = b"\x01" * len(self.bits)
+        self._combine(mask, lambda a, m: a ^ m)
+
+    # ----- consultas -----
+    def count(self):
+        return self.bits.count(1)
+
+    def first(self):
+        pos = self.bits.find(1)
+        return pos if pos >= 0 else None
+
+    def indices(self):
+        """Filas seleccionadas en orden ascendente."""
+        out = []
+        find = self.bits.find
+        pos = find(1)
+        while pos >= 0:
+            out.append(pos)
+            pos = find(1, pos + 1)
+        return out
+
+# ---------- búsqueda ----------
+SEARCH_DEBOUNCE_MS = 150
+# columnas que forman la etiqueta buscable "[Index] Name (Lv Level)"
+LABEL_COLS = (COL["Index"], NAME_COL, COL["Level"])
+
+def monster_label(table, i):
+    """Texto que se muestra (y se busca) para la fila i."""
+    cell = table.cell
+    return f"[{cell(i, 0)}] {cell(i, NAME_COL)} (Lv {cell(i, 3)})"
+
+def _trigrams(text):
+    return {text[k:k + 3] for k in range(len(text) - 2)}
+
+class SearchIndex:
+    """
+    Índice de búsqueda por subcadena sobre las etiquetas en minúsculas.
+    - Consultas de 3+ caracteres: intersección de listas de trigramas y
+      verificación final solo sobre los candidatos.
+    - Si la consulta nueva contiene a la anterior (seguir escribiendo), se
+      filtra sobre el resultado anterior en vez de recorrer toda la tabla.
+    Se actualiza fila a fila cuando se edita un monster.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.keys = []    # fila -> etiqueta en minúsculas
+        self.grams = {}   # trigrama -> set(filas)
+        self._last_query = None
+        self._last_rows = None
+        self.rebuild()
+
+    def rebuild(self, table=None):
+        if table is not None:
+            self.table = table
+        table = self.table
+        self.keys = [monster_label(table, i).lower() if table.alive[i] else "" for i in range(len(table))]
+        grams = {}
+        for row, key in enumerate(self.keys):
+            for g in _trigrams(key):
+                grams.setdefault(g, set()).add(row)
+        self.grams = grams
+        self._invalidate()
+
+    def update(self, row):
+        """Reindexa una fila editada, añadida al final o eliminada."""
+        key = monster_label(self.table, row).lower() if self.table.alive[row] else ""
+        if row < len(self.keys):
+            old = self.keys[row]
+            if old == key:
+                return
+            for g in _trigrams(old):
+                self.grams[g].discard(row)
+            self.keys[row] = key
+        else:
+            self.keys.append(key)
+        for g in _trigrams(key):
+            self.grams.setdefault(g, set()).add(row)
+        self._invalidate()
+
+    def _invalidate(self):
+        self._last_query = None
+        self._last_rows = None
+
+    @instrumented("search")
+    def search(self, query):
+        """Filas (ascendentes) cuya etiqueta contiene query; None si query está vacía."""
+        query = query.lower().strip()
+        if not query:
+            return None
+        if query == self._last_query:
+            return self._last_rows
+
+        keys = self.keys
+        if self._last_query and self._last_query in query:
+            # la consulta se estrechó: basta con revisar el resultado anterior
+            candidates = self._last_rows
+        elif len(query) >= 3:
+            postings = sorted((self.grams.get(g, ()) for g in _trigrams(query)), key=len)
+            common = set(postings[0])
+            for p in postings[1:]:
+                common &= p
+                if not common:
+                    break
+            candidates = sorted(common)
+        else:
+            candidates = range(len(keys))
+
+        rows = [r for r in candidates if query in keys[r]]
+        self._last_query = query
+        self._last_rows = rows
+        return rows
+
+# ---------- consultas por rango ----------
+class QueryError(ValueError):
+    """Consulta de filtro mal escrita."""
+
+_QUERY_TERM_RE = re.compile(r'^\s*([A-Za-z0-9_]+)\s*(==|!=|<=|>=|=|<|>)\s*(-?\d+(?:\.\d+)?)\s*$')
+_QUERY_AND_RE = re.compile(r'\s+AND\s+|\s*&&\s*', re.IGNORECASE)
+_COL_BY_LOWER = {name.lower(): i for i, name in enumerate(COLUMNS)}
+_ROW_LO = -1            # centinelas para bisect sobre tuplas (valor, fila)
+_ROW_HI = float("inf")
+
+def parse_query(text):
+    """
+    Parsea una consulta tipo "Level>=80 AND MaxLife<50000 AND AttackType==2".
+    Devuelve lista de (columna, operador, valor). Lanza QueryError si no es válida.
+    """
+    terms = []
+    for part in _QUERY_AND_RE.split(text.strip()):
+        m = _QUERY_TERM_RE.match(part)
+        if not m:
+            raise QueryError(f"Condición inválida: '{part}'")
+        name, op, value = m.groups()
+        ci = _COL_BY_LOWER.get(name.lower())
+        if ci is None:
+            raise QueryError(f"Columna desconocida: '{name}'")
+        if ci == NAME_COL:
+            raise QueryError("Name no es numérica; usa el buscador para nombres")
+        num = float(value)
+        terms.append((ci, "==" if op == "=" else op, int(num) if num.is_integer() else num))
+    return terms
+
+def _numeric_value(col, i):
+    """Valor numérico de la celda (None si el texto no es un número)."""
+    v = col[i]
+    if isinstance(col, array):
+        return v
+    try:
+        return float(v)
+    except ValueError:
+        return None
+
+class ColumnIndex:
+    """Índice ordenado de (valor, fila) para una columna numérica."""
+
+    def __init__(self, table, ci):
+        self.table = table
+        self.ci = ci
+        self.rebuild()
+
+    def rebuild(self):
+        col = self.table.columns[self.ci]
+        alive = self.table.alive
+        self.vals = [_numeric_value(col, i) if alive[i] else None for i in range(len(col))]
+        self.keys = sorted((v, i) for i, v in enumerate(self.vals) if v is not None)
+
+    def update(self, row):
+        """Reubica una fila editada, añadida al final o eliminada en el índice."""
+        new = _numeric_value(self.table.columns[self.ci], row) if self.table.alive[row] else None
+        if row == len(self.vals):
+            self.vals.append(None)
+        old = self.vals[row]
+        if old == new:
+            return
+        if old is not None:
+            del self.keys[bisect_left(self.keys, (old, row))]
+        if new is not None:
+            insort(self.keys, (new, row))
+        self.vals[row] = new
+
+    def rows_matching(self, op, value):
+        keys = self.keys
+        if op in ("==", "!="):
+            lo = bisect_left(keys, (value, _ROW_LO))
+            hi = bisect_right(keys, (value, _ROW_HI))
+            if op == "==":
+                return {r for _, r in keys[lo:hi]}
+            return {r for _, r in keys[:lo]} | {r for _, r in keys[hi:]}
+        if op == "<":
+            part = keys[:bisect_left(keys, (value, _ROW_LO))]
+        elif op == "<=":
+            part = keys[:bisect_right(keys, (value, _ROW_HI))]
+        elif op == ">":
+            part = keys[bisect_right(keys, (value, _ROW_HI)):]
+        else:  # ">="
+            part = keys[bisect_left(keys, (value, _ROW_LO)):]
+        return {r for _, r in part}
+
+class ColumnIndexes:
+    """
+    Índices ordenados por columna, creados al primer uso y mantenidos al
+    editar. Resuelven consultas con búsqueda binaria + intersección de sets.
+    """
+    # a partir de esta fracción de filas cambiadas sale más barato reconstruir
+    REBUILD_FRACTION = 0.125
+
+    def __init__(self, table):
+        self.table = table
+        self._indexes = {}
+
+    def reset(self, table=None):
+        if table is not None:
+            self.table = table
+        self._indexes.clear()
+
+    def get(self, ci):
+        idx = self._indexes.get(ci)
+        if idx is None:
+            idx = self._indexes[ci] = ColumnIndex(self.table, ci)
+        return idx
+
+    def rows_changed(self, rows, cols=None):
+        """Actualiza los índices ya creados (rows=None: todas las filas)."""
+        for ci, idx in self._indexes.items():
+            if cols is not None and ci not in cols:
+                continue
+            if rows is None or len(rows) > len(self.table) * self.REBUILD_FRACTION:
+                idx.rebuild()
+            else:
+                for r in rows:
+                    idx.update(r)
+
+    def query(self, terms):
+        """Filas (ascendentes) que cumplen todas las condiciones."""
+        sets = sorted((self.get(ci).rows_matching(op, v) for ci, op, v in terms), key=len)
+        if not sets:
+            return []
+        result = sets[0]
+        for s in sets[1:]:
+            result = result & s
+            if not result:
+                break
+        return sorted(result)
+
+# ---------- validación ----------
+# Reglas por columnas: cada una recorre columnas enteras (array('q') en su
+# mayoría) con zip/min/max, sin crear listas por fila; tras una edición solo
+# se revisan las filas y reglas afectadas.
+NUMERIC_COLS = tuple(ci for ci in range(len(COLUMNS)) if ci != NAME_COL)
+RESISTANCE_COLS = tuple(COL[f"Resistance{n}"] for n in range(1, 5))
+RESISTANCE_RANGE = (0, 255)
+
+Problem = namedtuple("Problem", "row rule col message severity")
+ValidationRule = namedtuple("ValidationRule", "name columns check")
+
+def _column_numbers(table, ci, rows):
+    """Valores numéricos de la columna para rows (None si el texto no es un número)."""
+    col = table.columns[ci]
+    if isinstance(col, array):
+        return col if isinstance(rows, range) and len(rows) == len(col) else [col[i] for i in rows]
+    return [_numeric_value(col, i) for i in rows]
+
+# byte de mayor/menor peso de cada entero de 8 bytes dentro de array.tobytes()
+_HIGH_BYTE, _LOW_BYTE = (7, 0) if sys.byteorder == "little" else (0, 7)
+_NON_NEGATIVE_BYTES = bytes(range(128))
+
+def _all_non_negative(ints):
+    """Sin recorrer en Python: ningún array('q') negativo tiene el bit de signo a 0."""
+    return not ints.tobytes()[_HIGH_BYTE::8].translate(None, _NON_NEGATIVE_BYTES)
+
+def _all_in_byte_range(ints):
+    """True si todos los valores del array('q') están en 0..255 (solo el byte bajo puede no ser 0)."""
+    raw = ints.tobytes()
+    return raw.count(0) - raw[_LOW_BYTE::8].count(0) == 7 * len(ints)
+
+def _check_numeric(table, rows):
+    out = []
+    for ci in NUMERIC_COLS:
+        col = table.columns[ci]
+        if isinstance(col, array):
+            continue  # una columna entera no puede tener textos
+        for i in rows:
+            if _numeric_value(col, i) is None:
+                out.append(Problem(i, "numeric", ci, f"{COLUMNS[ci]} no es un número: '{col[i]}'", "error"))
+    return out
+
+def _check_negative(table, rows):
+    out = []
+    for ci in NUMERIC_COLS:
+        vals = _column_numbers(table, ci, rows)
+        if isinstance(vals, array) and _all_non_negative(vals):
+            continue
+        out.extend(Problem(i, "negative", ci, f"{COLUMNS[ci]} negativo: {table.cell(i, ci)}", "error")
+                   for i, v in zip(rows, vals) if v is not None and v < 0)
+    return out
+
+def _check_damage(table, rows):
+    lo_ci, hi_ci = COL["DamageMin"], COL["DamageMax"]
+    los = _column_numbers(table, lo_ci, rows)
+    his = _column_numbers(table, hi_ci, rows)
+    return [Problem(i, "damage", lo_ci, f"DamageMin ({table.cell(i, lo_ci)}) mayor que DamageMax ({table.cell(i, hi_ci)})", "error")
+            for i, lo, hi in zip(rows, los, his)
+            if lo is not None and hi is not None and lo > hi]
+
+def _check_resistance(table, rows):
+    lo, hi = RESISTANCE_RANGE
+    out = []
+    for ci in RESISTANCE_COLS:
+        vals = _column_numbers(table, ci, rows)
+        if isinstance(vals, array) and RESISTANCE_RANGE == (0, 255) and _all_in_byte_range(vals):
+            continue
+        out.extend(Problem(i, "resistance", ci, f"{COLUMNS[ci]} fuera de rango {lo}-{hi}: {table.cell(i, ci)}", "error")
+                   for i, v in zip(rows, vals) if v is not None and not lo <= v <= hi)
+    return out
+
+def _check_name(table, rows):
+    names = table.columns[NAME_COL]
+    if not isinstance(rows, range):
+        names = [names[i] for i in rows]
+    return [Problem(i, "name", NAME_COL, "Name vacío", "aviso")
+            for i, name in zip(rows, names) if not name.strip()]
+
+VALIDATION_RULES = (
+    ValidationRule("numeric", frozenset(NUMERIC_COLS), _check_numeric),
+    ValidationRule("negative", frozenset(NUMERIC_COLS), _check_negative),
+    ValidationRule("damage", frozenset((COL["DamageMin"], COL["DamageMax"])), _check_damage),
+    ValidationRule("resistance", frozenset(RESISTANCE_COLS), _check_resistance),
+    ValidationRule("name", frozenset((NAME_COL,)), _check_name),
+)
+
+class TableValidator:
+    """
+    Problemas de la tabla por fila. validate_all() revisa todo (al cargar y
+    guardar); revalidate(rows, cols) solo las reglas que leen esas columnas
+    y solo esas filas. Los Index duplicados salen del IndexMap de la tabla.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.by_row = {}  # fila -> [Problem] de las reglas por fila
+        self.duplicates = []  # Problem de Index repetidos (dependen de varias filas)
+
+    def validate_all(self, table=None):
+        if table is not None:
+            self.table = table
+        self.by_row = {}
+        rows = self.table.live_rows()
+        for rule in VALIDATION_RULES:
+            self._add(rule.check(self.table, rows))
+        self._check_duplicates()
+
+    def revalidate(self, rows=None, cols=None):
+        """Vuelve a validar tras un cambio (rows=None: todas; cols=None: todas las reglas)."""
+        if rows is None:
+            self.validate_all()
+            return
+        rules = [r for r in VALIDATION_RULES if cols is None or not r.columns.isdisjoint(cols)]
+        names = {r.name for r in rules}
+        alive = self.table.alive
+        for row in rows:
+            kept = [p for p in self.by_row.pop(row, ()) if p.rule not in names]
+            if kept and alive[row]:
+                self.by_row[row] = kept
+        live = [row for row in rows if alive[row]]
+        for rule in rules:
+            self._add(rule.check(self.table, live))
+        if cols is None or INDEX_COL in cols:
+            self._check_duplicates()
+
+    def _add(self, problems):
+        by_row = self.by_row
+        for p in problems:
+            by_row.setdefault(p.row, []).append(p)
+
+    def _check_duplicates(self):
+        self.duplicates = [
+            Problem(row, "duplicate", INDEX_COL, f"Index {key} repetido ({len(rows)} filas)", "error")
+            for key, rows in self.table.duplicate_indexes().items() for row in rows
+        ]
+
+    def problems(self):
+        """Todos los problemas ordenados por fila."""
+        out = [p for ps in self.by_row.values() for p in ps] + self.duplicates
+        out.sort(key=lambda p: (p.row, p.col))
+        return out
+
+    def row_problems(self, row):
+        return self.by_row.get(row, []) + [p for p in self.duplicates if p.row == row]
+
+    def count(self, severity=None):
+        if severity is None:
+            return sum(map(len, self.by_row.values())) + len(self.duplicates)
+        ps = [p for ps in self.by_row.values() for p in ps] + self.duplicates
+        return sum(p.severity == severity for p in ps)
+
+# ---------- fórmulas ----------
+# "MaxLife = Level**2 * 12 + 100; Defense *= 1 + Level/400"
+# Cada sentencia se valida con ast (solo números, columnas, operadores y las
+# funciones de FORMULA_FUNCS) y se compila una sola vez a una comprensión
+# sobre las columnas: [expr for c4, c8 in zip(v4, v8)].
+class FormulaError(ValueError):
+    """Fórmula mal escrita o que no se puede evaluar."""
+
+def _clamp(x, lo, hi):
+    return lo if x < lo else hi if x > hi else x
+
+FORMULA_MAX_EXPONENT = 64
+_POW_MAX_BITS = 1024  # por encima se calcula en float: lo que no cabe en int64 se rechaza igual
+
+def _pow(base, exp):
+    """'**' de las fórmulas: un exponente entero enorme congelaría la ventana calculando."""
+    if abs(exp) > FORMULA_MAX_EXPONENT:
+        raise ValueError(f"exponente {exp} fuera de ±{FORMULA_MAX_EXPONENT}")
+    if type(base) is int and type(exp) is int and abs(base).bit_length() * exp > _POW_MAX_BITS:
+        base = float(base)  # OverflowError en vez de un entero de miles de dígitos
+    return base ** exp
+
+FORMULA_FUNCS = {
+    "min": min, "max": max, "abs": abs, "round": round, "floor": math.floor,
+    "ceil": math.ceil, "sqrt": math.sqrt, "log": math.log, "clamp": _clamp,
+}
+ROUNDING_MODES = {
+    "redondear": round,
+    "abajo": math.floor,
+    "arriba": math.ceil,
+    "truncar": math.trunc,
+}
+_FORMULA_BINOPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_FORMULA_AUGOPS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/"}
+_INT64 = (-(1 << 63), (1 << 63) - 1)
+
+FormulaStatement = namedtuple("FormulaStatement", "text target inputs code")
+
+class _FormulaCompiler(ast.NodeTransformer):
+    """Comprueba que la expresión solo use nodos permitidos y renombra columnas a c<n>."""
+
+    def __init__(self):
+        self.inputs = []
+
+    def generic_visit(self, node):
+        raise FormulaError(f"No permitido en fórmulas: '{ast.unparse(node)}'")
+
+    def visit_Expression(self, node):
+        node.body = self.visit(node.body)
+        return node
+
+    def visit_Constant(self, node):
+        if type(node.value) not in (int, float):
+            raise FormulaError(f"Valor no numérico: {node.value!r}")
+        return node
+
+    def visit_Name(self, node):
+        ci = _formula_column(node.id)
+        if ci not in self.inputs:
+            self.inputs.append(ci)
+        return ast.copy_location(ast.Name(id=f"c{ci}", ctx=ast.Load()), node)
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _FORMULA_BINOPS):
+            raise FormulaError(f"Operador no permitido en '{ast.unparse(node)}'")
+        node.left, node.right = self.visit(node.left), self.visit(node.right)
+        if isinstance(node.op, ast.Pow):
+            return ast.copy_location(ast.Call(func=ast.Name(id="_pow", ctx=ast.Load()),
+                                              args=[node.left, node.right], keywords=[]), node)
+        return node
+
+    def visit_UnaryOp(self, node):
+        if not isinstance(node.op, (ast.USub, ast.UAdd)):
+            raise FormulaError(f"Operador no permitido en '{ast.unparse(node)}'")
+        node.operand = self.visit(node.operand)
+        return node
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FORMULA_FUNCS or node.keywords:
+            raise FormulaError(f"Función no permitida: '{ast.unparse(node.func)}' "
+                               f"(disponibles: {', '.join(FORMULA_FUNCS)})")
+        node.func = ast.Name(id=f"f_{node.func.id}", ctx=ast.Load())
+        node.args = [self.visit(a) for a in node.args]
+        return node
+
+def _formula_column(name):
+    ci = _COL_BY_LOWER.get(name.lower())
+    if ci is None:
+        raise FormulaError(f"Columna desconocida: '{name}'")
+    if ci == NAME_COL:
+        raise FormulaError("Name no es numérica")
+    return ci
+
+def _compile_statement(text):
+    try:
+        tree = ast.parse(text.strip(), mode="exec")
+    except SyntaxError as e:
+        raise FormulaError(f"Sintaxis inválida en '{text.strip()}': {e.msg}") from None
+    if len(tree.body) != 1 or not isinstance(tree.body[0], (ast.Assign, ast.AugAssign)):
+        raise FormulaError(f"Se esperaba 'Columna = expresión' o 'Columna *= expresión': '{text.strip()}'")
+    stmt = tree.body[0]
+    if isinstance(stmt, ast.Assign):
+        if len(stmt.targets) != 1 or not isinstance(stmt.targets[0], ast.Name):
+            raise FormulaError(f"Solo se puede asignar a una columna: '{text.strip()}'")
+        target, expr = stmt.targets[0], stmt.value
+    else:
+        op = _FORMULA_AUGOPS.get(type(stmt.op))
+        if op is None or not isinstance(stmt.target, ast.Name):
+            raise FormulaError(f"Solo se admiten =, +=, -=, *= y /=: '{text.strip()}'")
+        # Defense *= e  ->  Defense * (e)
+        target = stmt.target
+        expr = ast.BinOp(left=ast.Name(id=target.id, ctx=ast.Load()), op=stmt.op, right=stmt.value)
+    target_ci = _formula_column(target.id)
+    compiler = _FormulaCompiler()
+    body = compiler.visit(ast.Expression(body=expr)).body
+    names = ", ".join(f"c{ci}" for ci in compiler.inputs) or "_"
+    sources = ", ".join(f"v{ci}" for ci in compiler.inputs) or "rows"
+    if len(compiler.inputs) > 1:
+        sources = f"zip({sources})"
+    source = f"[{ast.unparse(body)} for {names} in {sources}]"
+    code = compile(source, "<fórmula>", "eval")
+    return FormulaStatement(text.strip(), target_ci, tuple(compiler.inputs), code)
+
+FormulaResult = namedtuple("FormulaResult", "rows values skipped")
+
+class Formula:
+    """
+    Una o varias asignaciones separadas por ';' o saltos de línea, compiladas
+    al crear el objeto. evaluate() no modifica la tabla: devuelve los valores
+    nuevos para previsualizarlos (diff) y aplicarlos con apply().
+    """
+
+    def __init__(self, text):
+        parts = [p for p in re.split(r"[;\n]", text) if p.strip()]
+        if not parts:
+            raise FormulaError("Fórmula vacía")
+        self.text = text
+        self.statements = [_compile_statement(p) for p in parts]
+        self.targets = list(dict.fromkeys(s.target for s in self.statements))
+        self.inputs = list(dict.fromkeys(ci for s in self.statements for ci in s.inputs))
+
+    def evaluate(self, table, rows=None, rounding="redondear", lo=None, hi=None):
+        """
+        Calcula las columnas destino para rows (None = filas vivas). Las filas
+        con algún valor de entrada no numérico se saltan (skipped). Los
+        resultados se redondean con ROUNDING_MODES[rounding] y se acotan a
+        [lo, hi]; cada sentencia ve los resultados de las anteriores.
+        """
+        rows = table.live_rows() if rows is None else rows
+        cols = {ci: _column_numbers(table, ci, rows) for ci in self.inputs}
+        ok = [all(v is not None for v in vals) for vals in zip(*(cols[ci] for ci in self.inputs))]
+        skipped = []
+        if ok and not all(ok):
+            skipped = [r for r, good in zip(rows, ok) if not good]
+            rows = list(compress(rows, ok))
+            cols = {ci: list(compress(vals, ok)) for ci, vals in cols.items()}
+        rnd = ROUNDING_MODES[rounding]
+        env = {f"f_{name}": fn for name, fn in FORMULA_FUNCS.items()}
+        env["_pow"] = _pow
+        values = {}
+        for stmt in self.statements:
+            scope = {f"v{ci}": cols[ci] for ci in stmt.inputs}
+            scope["rows"] = rows
+            try:
+                out = list(map(rnd, eval(stmt.code, env, scope)))
+            except (ArithmeticError, ValueError, TypeError) as e:
+                raise FormulaError(f"Error al evaluar '{stmt.text}': {e}") from None
+            if lo is not None:
+                out = [v if v >= lo else lo for v in out]
+            if hi is not None:
+                out = [v if v <= hi else hi for v in out]
+            if out and (min(out) < _INT64[0] or max(out) > _INT64[1]):
+                raise FormulaError(f"'{stmt.text}' da valores demasiado grandes")
+            cols[stmt.target] = values[stmt.target] = out
+        return FormulaResult(rows, values, skipped)
+
+    @staticmethod
+    def diff(table, result):
+        """Celdas que cambiarían: lista de (fila, columna, texto actual, texto nuevo)."""
+        out = []
+        for ci, vals in result.values.items():
+            col = table.columns[ci]
+            out.extend((r, ci, str(col[r]), str(v)) for r, v in zip(result.rows, vals) if str(col[r]) != str(v))
+        out.sort()
+        return out
+
+    @staticmethod
+    def apply(table, result):
+        """Escribe el resultado en la tabla. Devuelve las filas que cambiaron (ordenadas)."""
+        changed = set()
+        for ci, vals in result.values.items():
+            changed.update(table.write_column(ci, result.rows, vals))
+        return sorted(changed)
+
+# ---------- diff / merge ----------
+# Compara dos tablas emparejando filas por Index. Dos filas con la misma línea
+# original tienen los mismos valores; el resto se arma como tuplas de valores
+# (una pasada por columna en C) y solo las que difieren se comparan celda a celda.
+DiffEntry = namedtuple("DiffEntry", "key kind row_a row_b cells")
+DIFF_KINDS = ("changed", "added", "removed")
+
+def _row_keys(table):
+    """{clave: fila} de las filas vivas; un Index repetido se distingue como 'Index#2', 'Index#3'…"""
+    rows = table.live_rows()
+    col = table.columns[INDEX_COL]
+    texts = list(map(str, col)) if isinstance(rows, range) else [str(col[i]) for i in rows]
+    keys = dict(zip(texts, rows))
+    if len(keys) == len(texts):
+        return keys  # caso normal: sin Index repetidos
+    keys, seen = {}, {}
+    for i, key in zip(rows, texts):
+        if key in seen:
+            seen[key] += 1
+            key = f"{key}#{seen[key]}"
+        else:
+            seen[key] = 1
+        keys[key] = i
+    return keys
+
+def _row_tuples(table, text_cols, rows):
+    """Tupla de valores de cada fila de rows; las columnas de text_cols se pasan a texto para compararlas con la otra tabla."""
+    cols = [list(map(col.__getitem__, rows)) for col in table.columns]
+    for ci in text_cols:
+        cols[ci] = list(map(str, cols[ci]))
+    return list(zip(*cols))
+
+def diff_tables(a, b):
+    """
+    Diferencias de a hacia b, en el orden de las filas: DiffEntry con kind
+    'changed' (cells = [(columna, texto en a, texto en b)]), 'removed'
+    (solo en a) o 'added' (solo en b, al final).
+    """
+    # si una columna es entera en una tabla y texto en la otra se compara como texto
+    text_cols = {ci for ci in range(len(COLUMNS)) if a.is_int_column(ci) != b.is_int_column(ci)}
+    keys_a, keys_b = _row_keys(a), _row_keys(b)
+    # con la misma línea original no hace falta mirar los valores
+    src_a, src_b = a.source, b.source
+    pairs = [(ra, keys_b[key]) for key, ra in keys_a.items()
+             if key in keys_b and (src_a[ra] is None or src_a[ra] != src_b[keys_b[key]])]
+    rows_a = _row_tuples(a, text_cols, [ra for ra, _ in pairs])
+    rows_b = _row_tuples(b, text_cols, [rb for _, rb in pairs])
+    differ = {ra for (ra, _), ta, tb in zip(pairs, rows_a, rows_b) if ta != tb}
+    out = []
+    for key, ra in keys_a.items():
+        rb = keys_b.get(key)
+        if rb is None:
+            out.append(DiffEntry(key, "removed", ra, None, []))
+        elif ra in differ:
+            cells = [(ci, a.cell(ra, ci), b.cell(rb, ci)) for ci in range(len(COLUMNS))
+                     if a.cell(ra, ci) != b.cell(rb, ci)]
+            if cells:
+                out.append(DiffEntry(key, "changed", ra, rb, cells))
+    out.extend(DiffEntry(key, "added", None, rb, []) for key, rb in keys_b.items() if key not in keys_a)
+    return out
+
+def diff_summary(entries):
+    kinds = [e.kind for e in entries]
+    cells = sum(len(e.cells) for e in entries)
+    return (f"{kinds.count('changed')} cambiados ({cells} celdas), "
+            f"{kinds.count('added')} agregados, {kinds.count('removed')} eliminados")
+
+def merge_diff(table, other, picks):
+    """
+    Trae a table cambios de other. picks: [(DiffEntry, columnas)] con
+    entradas de diff_tables(table, other); columnas=None trae la fila entera.
+    Devuelve (filas tocadas, filas nuevas).
+    """
+    touched, added = [], []
+    for entry, cols in picks:
+        if entry.kind == "changed":
+            for ci, _, new in entry.cells:
+                if cols is None or ci in cols:
+                    table.set_cell(entry.row_a, ci, new)
+            touched.append(entry.row_a)
+        elif entry.kind == "added":
+            row = table.append_row(other[entry.row_b])
+            touched.append(row)
+            added.append(row)
+        elif table.is_alive(entry.row_a):
+            table.delete_row(entry.row_a)
+            touched.append(entry.row_a)
+    return touched, added
+
+MergeConflict = namedtuple("MergeConflict", "key row row_theirs col base mine theirs")
+
+def three_way_merge(base, mine, theirs):
+    """
+    Cambios de base -> theirs (p.ej. el archivo modificado por otro programa)
+    que se pueden llevar a mine (base + ediciones locales) sin pisar nada.
+    Devuelve (entries, conflicts): entries son DiffEntry relativas a mine para
+    merge_diff(mine, theirs, ...); en los conflictos se conserva el valor local
+    (col=None: la fila entera, borrada en un lado y cambiada en el otro).
+
+    Ejemplo (python -m doctest main.py): el cambio en disco se trae y la
+    edición local se conserva:
+
+    >>> base = MonsterTable.from_rows([["1", "1", "Golem", "10", "-1"] + ["0"] * (len(COLUMNS) - 5)])
+    >>> mine, theirs = base.copy(), base.copy()
+    >>> theirs.set_cell(0, COL["MaxLife"], "-2")
+    >>> mine.set_cell(0, COL["Defense"], "-1")
+    >>> entries, conflicts = three_way_merge(base, mine, theirs)
+    >>> [(e.kind, e.cells) for e in entries], conflicts
+    ([('changed', [(4, '-1', '-2')])], [])
+    >>> merge_external(mine, theirs, entries)[0], mine.cell(0, COL["MaxLife"]), mine.cell(0, COL["Defense"])
+    ([0], '-2', '-1')
+    """
+    rows_mine = _row_keys(mine)
+    entries, conflicts = [], []
+    for e in diff_tables(base, theirs):
+        rm = rows_mine.get(e.key)
+        if e.kind == "changed":
+            if rm is None:
+                conflicts.append(MergeConflict(e.key, None, e.row_b, None, "", "eliminado", "modificado"))
+                continue
+            cells = []
+            for ci, old, new in e.cells:
+                local = mine.cell(rm, ci)
+                if local == old:
+                    cells.append((ci, local, new))
+                elif local != new:
+                    conflicts.append(MergeConflict(e.key, rm, e.row_b, ci, old, local, new))
+            if cells:
+                entries.append(DiffEntry(e.key, "changed", rm, e.row_b, cells))
+        elif e.kind == "added":
+            if rm is None:
+                entries.append(e)
+                continue
+            # agregado en los dos lados con el mismo Index
+            conflicts.extend(MergeConflict(e.key, rm, e.row_b, ci, "", mine.cell(rm, ci), theirs.cell(e.row_b, ci))
+                             for ci in range(len(COLUMNS)) if mine.cell(rm, ci) != theirs.cell(e.row_b, ci))
+        elif rm is not None:
+            if mine[rm] == base[e.row_a]:
+                entries.append(DiffEntry(e.key, "removed", rm, None, []))
+            else:
+                conflicts.append(MergeConflict(e.key, rm, None, None, "", "modificado", "eliminado"))
+    return entries, conflicts
+
+def merge_external(mine, theirs, entries):
+    """
+    Aplica las entradas de three_way_merge y marca como limpias las filas que
+    quedan iguales a la versión en disco. Devuelve (filas tocadas, filas nuevas).
+    """
+    touched, added = merge_diff(mine, theirs, [(e, None) for e in entries])
+    rows_theirs = _row_keys(theirs)
+    rows_mine = _row_keys(mine)
+    for key in {e.key for e in entries if e.kind != "removed"}:
+        rm, rt = rows_mine.get(key), rows_theirs.get(key)
+        if rm is not None and rt is not None and mine[rm] == theirs[rt]:
+            mine.adopt_line(rm, theirs.source[rt])
+    return touched, added
+
+def take_theirs(mine, theirs, conflicts):
+    """Resuelve conflictos de three_way_merge quedándose con la versión de theirs."""
+    touched, added = [], []
+    for c in conflicts:
+        if c.col is not None:
+            mine.set_cell(c.row, c.col, c.theirs)
+            if c.row_theirs is not None and mine[c.row] == theirs[c.row_theirs]:
+                mine.adopt_line(c.row, theirs.source[c.row_theirs])
+            touched.append(c.row)
+        elif c.row is None:
+            # borrado aquí, modificado en disco: vuelve la fila del disco
+            row = mine.append_row(theirs[c.row_theirs])
+            mine.adopt_line(row, theirs.source[c.row_theirs])
+            touched.append(row)
+            added.append(row)
+        elif mine.is_alive(c.row):
+            # modificado aquí, borrado en disco
+            mine.delete_row(c.row)
+            touched.append(c.row)
+    return touched, added
+
+# ---------- análisis de balance ----------
+# Distribuciones por columna, curvas por tramo de Level, atípicos respecto a
+# su tramo y una simulación sencilla de combate contra perfiles de personaje.
+# Todo se calcula por columnas enteras (comprensiones sobre zip, como las
+# fórmulas); tras una edición solo se recalculan las columnas afectadas y, en
+# la simulación, solo las filas tocadas.
+ANALYSIS_COLS = tuple(COL[c] for c in (
+    "Level", "MaxLife", "MaxMana", "DamageMin", "DamageMax", "Defense", "MagicDefense",
+    "AttackRate", "DefenseRate", "AttackSpeed", "ItemRate", "MoneyRate", "MaxItemLevel"))
+ANALYSIS_PERCENTILES = (5, 25, 50, 75, 95)
+LEVEL_COL = COL["Level"]
+LEVEL_BUCKET = 10  # ancho de los tramos de Level de las curvas
+OUTLIER_Z = 3.0  # desviaciones típicas respecto a la media del tramo para ser atípico
+OUTLIER_MIN_BUCKET = 5  # los tramos con menos monsters no marcan atípicos
+
+ColumnStats = namedtuple("ColumnStats", "col count min max mean stdev percentiles")
+LevelPoint = namedtuple("LevelPoint", "level count mean min max stdev")
+Outlier = namedtuple("Outlier", "row col value expected z")
+
+def _live_numbers(table, ci, rows):
+    """Valores numéricos de la columna en rows, sin los textos que no son números."""
+    vals = _column_numbers(table, ci, rows)
+    if isinstance(vals, array):
+        return vals
+    return [v for v in vals if v is not None]
+
+def _mean_stdev(vals):
+    n = len(vals)
+    mean = sum(vals) / n
+    var = sum(map(mul, vals, vals)) / n - mean * mean
+    return mean, math.sqrt(var) if var > 0 else 0.0
+
+def column_stats(table, ci, rows=None):
+    """ColumnStats de la columna sobre las filas vivas (o rows); None si no hay números."""
+    vals = _live_numbers(table, ci, table.live_rows() if rows is None else rows)
+    if not vals:
+        return None
+    ordered = sorted(vals)
+    n = len(ordered)
+    mean, stdev = _mean_stdev(ordered)
+    pcts = {p: ordered[min(n - 1, n * p // 100)] for p in ANALYSIS_PERCENTILES}
+    return ColumnStats(ci, n, ordered[0], ordered[-1], mean, stdev, pcts)
+
+def level_buckets(table, rows=None):
+    """{tramo: [filas]} según Level // LEVEL_BUCKET (las filas con Level no numérico quedan fuera)."""
+    rows = table.live_rows() if rows is None else rows
+    buckets = {}
+    for i, lv in zip(rows, _column_numbers(table, LEVEL_COL, rows)):
+        if lv is not None:
+            buckets.setdefault(int(lv // LEVEL_BUCKET), []).append(i)
+    return dict(sorted(buckets.items()))
+
+def level_curve(table, ci, buckets):
+    """[LevelPoint] de la columna por tramo: la curva 'esperada' para cada Level."""
+    points = []
+    for bucket, rows in buckets.items():
+        vals = _live_numbers(table, ci, rows)
+        if not vals:
+            continue
+        mean, stdev = _mean_stdev(vals)
+        points.append(LevelPoint(bucket * LEVEL_BUCKET, len(vals), mean, min(vals), max(vals), stdev))
+    return points
+
+def find_outliers(table, ci, buckets, curve, z=OUTLIER_Z):
+    """Filas cuyo valor se aleja más de z desviaciones de la media de su tramo de Level."""
+    out = []
+    by_level = {p.level: p for p in curve}
+    for bucket, rows in buckets.items():
+        p = by_level.get(bucket * LEVEL_BUCKET)
+        if p is None or p.count < OUTLIER_MIN_BUCKET or not p.stdev:
+            continue
+        lo, hi = p.mean - z * p.stdev, p.mean + z * p.stdev
+        out.extend(Outlier(i, ci, v, p.mean, (v - p.mean) / p.stdev)
+                   for i, v in zip(rows, _column_numbers(table, ci, rows))
+                   if v is not None and (v < lo or v > hi))
+    out.sort(key=lambda o: -abs(o.z))
+    return out
+
+# --- simulación de combate ---
+# Modelo simplificado, pensado para comparar monsters y versiones entre sí:
+#   acierto   = 1 - DefenseRate del defensor / AttackRate del atacante (entre HIT_CHANCE_MIN y 1)
+#   daño      = daño medio - Defense (como mínimo MIN_DAMAGE_FRACTION del daño medio)
+#   TTK       = MaxLife / (acierto * daño * golpes por segundo del personaje)
+#   daño recibido = daño por segundo del monster (1000 / AttackSpeed golpes/s) * TTK
+#   botín     = ItemRate * (1 + MaxItemLevel) * DROP_ITEM_WEIGHT + MoneyRate * Level * DROP_MONEY_WEIGHT
+# El botín son puntos relativos (no hay precios de items en Monster.txt).
+HIT_CHANCE_MIN = 0.05
+MIN_DAMAGE_FRACTION = 0.1
+DROP_ITEM_WEIGHT = 1.0
+DROP_MONEY_WEIGHT = 0.1
+SIM_COLS = tuple(COL[c] for c in (
+    "MaxLife", "DamageMin", "DamageMax", "Defense", "AttackRate", "DefenseRate",
+    "AttackSpeed", "ItemRate", "MoneyRate", "MaxItemLevel", "Level"))
+
+class ProfileError(ValueError):
+    """Perfil de personaje inválido."""
+
+CharacterProfile = namedtuple(
+    "CharacterProfile", "name life damage_min damage_max attack_rate attacks_per_sec defense defense_rate")
+PROFILE_FIELDS = {
+    "life": "Vida", "damage_min": "Daño mín", "damage_max": "Daño máx", "attack_rate": "AttackRate",
+    "attacks_per_sec": "Golpes/s", "defense": "Defensa", "defense_rate": "DefenseRate",
+}
+DEFAULT_PROFILES = (
+    CharacterProfile("Novato", 500, 40, 60, 150, 1.5, 30, 50),
+    CharacterProfile("Medio", 3000, 400, 600, 1000, 2.0, 300, 500),
+    CharacterProfile("Avanzado", 15000, 2000, 3000, 4000, 3.0, 1200, 2000),
+)
+
+def make_profile(name, **fields):
+    """CharacterProfile a partir de textos o números; ProfileError si algún valor no sirve."""
+    values = {}
+    for key, label in PROFILE_FIELDS.items():
+        try:
+            v = float(fields[key])
+        except KeyError:
+            raise ProfileError(f"falta '{key}' ({label})") from None
+        except (TypeError, ValueError):
+            raise ProfileError(f"{label} no es un número: '{fields[key]}'") from None
+        if v < 0 or not math.isfinite(v):
+            raise ProfileError(f"{label} debe ser un número positivo")
+        values[key] = v
+    if not str(name).strip():
+        raise ProfileError("el perfil necesita un nombre")
+    if values["attack_rate"] <= 0 or values["attacks_per_sec"] <= 0:
+        raise ProfileError("AttackRate y golpes/s deben ser mayores que 0")
+    if values["damage_min"] > values["damage_max"]:
+        raise ProfileError("el daño mínimo es mayor que el máximo")
+    return CharacterProfile(str(name).strip(), **values)
+
+def load_profiles(path):
+    """Perfiles de un JSON: [{"name": "Medio", "life": 2500, "damage_min": 300, …}, …]."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list) or not data:
+        raise ProfileError("se esperaba una lista de perfiles")
+    profiles = []
+    for item in data:
+        if not isinstance(item, dict):
+            raise ProfileError("cada perfil debe ser un objeto JSON")
+        fields = dict(item)
+        profiles.append(make_profile(fields.pop("name", ""), **fields))
+    names = [p.name for p in profiles]
+    if len(set(names)) != len(names):
+        raise ProfileError("hay perfiles con el mismo nombre")
+    return profiles
+
+SimResult = namedtuple("SimResult", "ttk taken drop drop_per_min")
+
+def _sim_numbers(table, ci, rows):
+    vals = _column_numbers(table, ci, rows)
+    return vals if isinstance(vals, array) else [0 if v is None else v for v in vals]
+
+def sim_columns(table, rows):
+    """Columnas que lee simulate() para rows (se leen una vez para todos los perfiles)."""
+    return tuple(_sim_numbers(table, ci, rows) for ci in SIM_COLS)
+
+def simulate(table, profile, rows, columns=None):
+    """
+    Simula profile contra las filas rows de una vez. Devuelve SimResult con
+    una lista por métrica, en el orden de rows (TTK infinito si no puede matarlo).
+    """
+    life, dmin, dmax, defense, arate, drate, aspeed, irate, mrate, ilevel, level = (
+        columns if columns is not None else sim_columns(table, rows))
+    p = profile
+    lo_hit, frac, inf = HIT_CHANCE_MIN, MIN_DAMAGE_FRACTION, math.inf
+    # min()/max() por celda cuestan más que el resto del cálculo: comparaciones en línea
+    avg = (p.damage_min + p.damage_max) / 2
+    floor = avg * frac
+    hit = [1 - dr / p.attack_rate for dr in drate]
+    dmg = [avg - d for d in defense]
+    dps = [(lo_hit if h < lo_hit else 1.0 if h > 1 else h) * (x if x > floor else floor) * p.attacks_per_sec
+           for h, x in zip(hit, dmg)]
+    ttk = [hp / s if s > 0 else inf for hp, s in zip(life, dps)]
+    # daño por segundo del monster contra el personaje
+    hit = [1 - p.defense_rate / ar if ar > 0 else lo_hit for ar in arate]
+    avg = [(lo + hi) / 2 for lo, hi in zip(dmin, dmax)]
+    taken_ps = [(lo_hit if h < lo_hit else 1.0 if h > 1 else h)
+                * (a - p.defense if a - p.defense > a * frac else a * frac) * 1000 / sp if sp > 0 else 0.0
+                for h, a, sp in zip(hit, avg, aspeed)]
+    taken = [m * t if m else 0.0 for m, t in zip(taken_ps, ttk)]
+    drop = [ir * (1 + il) * DROP_ITEM_WEIGHT + mr * lv * DROP_MONEY_WEIGHT
+            for ir, il, mr, lv in zip(irate, ilevel, mrate, level)]
+    per_min = [d * 60 / t if 0 < t < inf else 0.0 for d, t in zip(drop, ttk)]
+    return SimResult(ttk, taken, drop, per_min)
+
+def sim_summary(profile, result):
+    """Resumen de un SimResult: TTK mediano y p95, daño recibido mediano, muertes del personaje, botín/min medio."""
+    n = len(result.ttk)
+    if not n:
+        return {"monsters": 0}
+    ttk = sorted(result.ttk)
+    killable = [t for t in ttk if t < math.inf]
+    return {
+        "monsters": n,
+        "ttk_median": ttk[n // 2],
+        "ttk_p95": ttk[min(n - 1, n * 95 // 100)],
+        "unkillable": n - len(killable),
+        "taken_median": sorted(result.taken)[n // 2],
+        "deaths": sum(t >= profile.life for t in result.taken),
+        "drop_per_min_mean": sum(result.drop_per_min) / n,
+    }
+
+class BalanceAnalysis:
+    """
+    Estadísticas, curvas, atípicos y simulación de una tabla. refresh() calcula
+    todo; update(rows, cols) (mismos argumentos que _table_changed) rehace solo
+    las columnas afectadas y simula de nuevo solo esas filas.
+    """
+
+    def __init__(self, table, profiles=DEFAULT_PROFILES):
+        self.table = table
+        self.profiles = list(profiles)
+        self.stats = {}  # columna -> ColumnStats (o None)
+        self.buckets = {}  # tramo de Level -> filas
+        self.curves = {}  # columna -> [LevelPoint]
+        self.outliers = {}  # columna -> [Outlier]
+        self.sim = {}  # nombre del perfil -> SimResult indexado por id de fila
+        self.refresh()
+
+    def refresh(self, table=None):
+        if table is not None:
+            self.table = table
+        self._columns_changed(ANALYSIS_COLS, levels=True)
+        self._simulate_all()
+
+    def set_profiles(self, profiles):
+        self.profiles = list(profiles)
+        self._simulate_all()
+
+    def update(self, rows=None, cols=None):
+        if rows is None:
+            self.refresh()
+            return
+        if cols is None:
+            # altas / bajas o cambios de fila completa
+            self._columns_changed(ANALYSIS_COLS, levels=True)
+        else:
+            touched = [ci for ci in ANALYSIS_COLS if ci in cols]
+            if touched:
+                self._columns_changed(touched, levels=LEVEL_COL in cols)
+            if not any(ci in cols for ci in SIM_COLS):
+                return
+        simulated = len(next(iter(self.sim.values())).ttk) if self.sim else 0
+        if simulated != len(self.table):
+            self._simulate_all()  # filas nuevas: los resultados se indexan por id de fila
+            return
+        rows = list(rows)
+        columns = sim_columns(self.table, rows)
+        for p in self.profiles:
+            fresh, stored = simulate(self.table, p, rows, columns), self.sim[p.name]
+            for old, new in zip(stored, fresh):
+                for i, v in zip(rows, new):
+                    old[i] = v
+
+    def _columns_changed(self, cols, levels):
+        table = self.table
+        if levels:
+            self.buckets = level_buckets(table)
+            cols = ANALYSIS_COLS  # cambian los tramos: todas las curvas
+        for ci in cols:
+            self.stats[ci] = column_stats(table, ci)
+            if ci != LEVEL_COL:  # Level contra su propio tramo no dice nada
+                self.curves[ci] = level_curve(table, ci, self.buckets)
+                self.outliers[ci] = find_outliers(table, ci, self.buckets, self.curves[ci])
+
+    def _simulate_all(self):
+        rows = range(len(self.table))  # también las muertas: así el índice es el id de fila
+        columns = sim_columns(self.table, rows)
+        self.sim = {p.name: SimResult(*(array("d", vals) for vals in simulate(self.table, p, rows, columns)))
+                    for p in self.profiles}
+
+    def summaries(self):
+        """{perfil: sim_summary} sobre las filas vivas."""
+        rows = self.table.live_rows()
+        out = {}
+        for p in self.profiles:
+            res = self.sim[p.name]
+            if not isinstance(rows, range):
+                res = SimResult(*([vals[i] for i in rows] for vals in res))
+            out[p.name] = sim_summary(p, res)
+        return out
+
+    def all_outliers(self):
+        return sorted((o for outs in self.outliers.values() for o in outs), key=lambda o: -abs(o.z))
+
+def format_number(v):
+    """Número para mostrar: enteros tal cual, decimales solo en valores pequeños, '∞' si no hay fin."""
+    if isinstance(v, int):
+        return str(v)
+    if not math.isfinite(v):
+        return "∞"
+    return f"{v:.0f}" if abs(v) >= 1000 else f"{v:.2f}"
+
+def _change_pct(before, now):
+    """'+12.5%' de before a now ('' si no se puede comparar)."""
+    if not before or not math.isfinite(before) or not math.isfinite(now):
+        return ""
+    return f"{(now / before - 1) * 100:+.1f}%"
+
+# ---------- GUI: lista virtualizada ----------
+class VirtualMonsterList(ttk.Frame):
+    """
+    Lista de monsters con checkbox dibujada sobre un Canvas.
+    Solo existen items para las filas visibles (pool fijo que se reutiliza al
+    hacer scroll), así que refrescar cuesta lo mismo con 500 que con 50.000 filas.
+    """
+    ROW_HEIGHT = 22
+
+    def __init__(self, parent, selection, get_label, on_double_click=None, on_toggle=None):
+        super().__init__(parent)
+        self.selection = selection              # SelectionModel (la lista solo lo pinta)
+        self.get_label = get_label              # fila -> texto a mostrar
+        self.on_double_click = on_double_click  # fila -> None
+        self.on_toggle = on_toggle              # fila -> None
+        self.rows = []        # filas (índices en self.monsters) que pasan el filtro
+        self.top = 0          # posición (en self.rows) de la primera fila visible
+        self._pool = []       # [(id_check, id_texto)] items del canvas reutilizados
+
+        style = ttk.Style()
+        self._fg = style.lookup("TLabel", "foreground") or "black"
+        canvas_opts = {"borderwidth": 0, "highlightthickness": 0}
+        bg = style.lookup("TFrame", "background")
+        if bg:
+            canvas_opts["background"] = bg
+
+        self.canvas = tk.Canvas(self, **canvas_opts)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.canvas.bind("<Configure>", lambda e: self._resize_pool())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Double-Button-1>", self._on_double_click)
+        # la rueda solo se captura mientras el ratón está encima de la lista
+        self.canvas.bind("<Enter>", lambda e: self._bind_wheel(True))
+        self.canvas.bind("<Leave>", lambda e: self._bind_wheel(False))
+
+    # ----- datos -----
+    def set_rows(self, rows):
+        """Cambia las filas mostradas (resultado del filtro) y repinta."""
+        self.rows = rows
+        self._scroll_to(self.top)
+
+    def redraw(self):
+        self._render()
+
+    # ----- geometría / pintado -----
+    def _visible_count(self):
+        return max(1, self.canvas.winfo_height() // self.ROW_HEIGHT)
+
+    def _resize_pool(self):
+        needed = self._visible_count() + 1
+        while len(self._pool) < needed:
+            y = len(self._pool) * self.ROW_HEIGHT + self.ROW_HEIGHT // 2
+            chk = self.canvas.create_text(8, y, anchor="w", fill=self._fg, font=("Segoe UI Symbol", 11))
+            txt = self.canvas.create_text(28, y, anchor="w", fill=self._fg)
+            self._pool.append((chk, txt))
+        while len(self._pool) > needed:
+            chk, txt = self._pool.pop()
+            self.canvas.delete(chk, txt)
+        self._scroll_to(self.top)
+
+    def _render(self):
+        n = len(self.rows)
+        for k, (chk, txt) in enumerate(self._pool):
+            pos = self.top + k
+            if pos < n:
+                row = self.rows[pos]
+                self.canvas.itemconfigure(chk, text="☑" if self.selection.is_selected(row) else "☐", state="normal")
+                self.canvas.itemconfigure(txt, text=self.get_label(row), state="normal")
+            else:
+                self.canvas.itemconfigure(chk, state="hidden")
+                self.canvas.itemconfigure(txt, state="hidden")
+
+        if n:
+            visible = self._visible_count()
+            self.scrollbar.set(self.top / n, min(1.0, (self.top + visible) / n))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _scroll_to(self, top):
+        max_top = max(0, len(self.rows) - self._visible_count())
+        self.top = min(max(0, int(top)), max_top)
+        self._render()
+
+    # ----- eventos -----
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self._scroll_to(float(args[1]) * len(self.rows))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self._visible_count()
+            self._scroll_to(self.top + amount)
+
+    def _bind_wheel(self, active):
+        if active:
+            self.canvas.bind_all("<MouseWheel>", self._on_wheel)
+            self.canvas.bind_all("<Button-4>", self._on_wheel)
+            self.canvas.bind_all("<Button-5>", self._on_wheel)
+        else:
+            self.canvas.unbind_all("<MouseWheel>")
+            self.canvas.unbind_all("<Button-4>")
+            self.canvas.unbind_all("<Button-5>")
+
+    def _on_wheel(self, event):
+        if event.num == 4:
+            step = -3
+        elif event.num == 5:
+            step = 3
+        else:
+            step = -3 if event.delta > 0 else 3
+        self._scroll_to(self.top + step)
+
+    def _row_at(self, y):
+        pos = self.top + int(y) // self.ROW_HEIGHT
+        if 0 <= pos < len(self.rows):
+            return self.rows[pos]
+        return None
+
+    def _on_click(self, event):
+        row = self._row_at(event.y)
+        if row is None:
+            return
+        self.selection.toggle(row)
+        self._render()
+        if self.on_toggle:
+            self.on_toggle(row)
+
+    def _on_double_click(self, event):
+        row = self._row_at(event.y)
+        if row is not None and self.on_double_click:
+            self.on_double_click(row)
+
+# ---------- GUI: I/O en segundo plano ----------
+class BackgroundJob:
+    """
+    Ejecuta fn(progress, cancel) en el hilo de I/O y entrega el resultado (o el
+    error) en el hilo de Tk mediante after(), sin congelar la ventana.
+    """
+    POLL_MS = 50
+    _executor = None  # un solo hilo: las operaciones de archivo van en orden
+
+    def __init__(self, master, fn, on_done, on_error, on_progress=None):
+        if BackgroundJob._executor is None:
+            BackgroundJob._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="monsterz-io")
+        self.master = master
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.cancel_event = threading.Event()
+        self.progress = 0.0  # lo escribe el hilo de I/O, lo lee _poll
+        self.future = self._executor.submit(fn, self._report, self.cancel_event)
+        self.master.after(self.POLL_MS, self._poll)
 
-    index, rate, name, rest = m.groups()
-    rest_parts = re.split(r'\s+', rest.strip())
-    row = [index, rate, name] + rest_parts
-    # Ensure the row has same number of columns as COLUMNS (pad with zeros if needed)
-    if len(row) < len(COLUMNS):
-        row += ["0"] * (len(COLUMNS) - len(row))
-    return row[:len(COLUMNS)]
+    def _report(self, fraction):
+        self.progress = fraction
 
-def format_monster_line(row):
-    """Formatea una fila (lista) a línea para guardar en el archivo"""
-    # Name in quotes, align spaces similar to original
-    name = f"\"{row[2]}\""
-    left = f"{row[0]:<8}{row[1]:<8}{name:<35}"
-    right = " ".join(str(x) for x in row[3:])
-    return left + right
+    def cancel(self):
+        self.cancel_event.set()
 
-def load_file(path=FILE_PATH):
-    """Carga el archivo entero, devuelve (header_lines, monsters_list, footer_lines)"""
-    header = []
-    monsters = []
-    footer = []
-    with open(path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
+    def _poll(self):
+        if not self.future.done():
+            if self.on_progress:
+                self.on_progress(self.progress)
+            self.master.after(self.POLL_MS, self._poll)
+            return
+        try:
+            result = self.future.result()
+        except Exception as e:
+            self.on_error(e)
+            return
+        self.on_done(result)
 
-    in_monsters = True
-    for ln in lines:
-        if ln.strip().lower() == "end":
-            footer.append(ln.rstrip("\n"))
-            in_monsters = False
-            continue
+# ---------- GUI: cambios externos ----------
+def file_signature(path):
+    """(mtime_ns, tamaño) del archivo, o None si no existe."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
 
-        parsed = parse_monster_line(ln)
-        if parsed:
-            monsters.append(parsed)
-        else:
-            # if it's non-data and we haven't reached "end", treat as header
-            if in_monsters:
-                header.append(ln.rstrip("\n"))
-            else:
-                footer.append(ln.rstrip("\n"))
+class FileWatcher:
+    """
+    Vigila un archivo comparando su (mtime, tamaño) cada POLL_MS con after();
+    sin hilos ni dependencias (la biblioteca estándar no trae inotify).
+    Avisa con on_change(firma) cuando la firma cambió y se mantuvo igual dos
+    sondeos seguidos (el otro programa terminó de escribir). Si on_change
+    devuelve False se volverá a avisar más tarde.
+    """
+    POLL_MS = 1000
 
-    return header, monsters, footer
+    def __init__(self, master, path, on_change):
+        self.master = master
+        self.path = path
+        self.on_change = on_change
+        self.known = file_signature(path)  # la versión que tiene el editor
+        self._pending = None
+        self.master.after(self.POLL_MS, self._poll)
 
-def save_file(monsters, header, footer, path=FILE_PATH):
-    """Guarda todo preservando header/footer (aprox)."""
-    with open(path, "w", encoding="utf-8") as f:
-        # write header lines (or a standard header if none)
-        if header:
-            for h in header:
-                f.write(h + "\n")
-        else:
-            f.write("//Index   Rate   Name                                 Level ...\n")
+    def accept(self, signature):
+        """El editor ya tiene esta versión del archivo (tras cargar o guardar)."""
+        self.known = signature
+        self._pending = None
 
-        for m in monsters:
-            f.write(format_monster_line(m) + "\n")
+    def changed(self):
+        sig = file_signature(self.path)
+        return sig is not None and sig != self.known
 
-        # write footer if exists, else write 'end'
-        if footer:
-            for ft in footer:
-                f.write(ft + "\n")
-        else:
-            f.write("end\n")
+    def _poll(self):
+        sig = file_signature(self.path)
+        if sig is None or sig == self.known:
+            self._pending = None
+        elif sig != self._pending:
+            self._pending = sig
+        elif self.on_change(sig) is not False:
+            self._pending = None
+        self.master.after(self.POLL_MS, self._poll)
 
 # ---------- GUI ----------
+MAX_ISSUES_SHOWN = 15
+METRICS_REFRESH_MS = 1000
+# operaciones que se muestran en la barra de estado
+METRICS_STATUS_OPS = (("refresh_list", "lista"), ("search", "búsqueda"), ("table_changed", "cambios"),
+                      ("apply_percentage", "porcentaje"), ("load", "carga"), ("save", "guardado"))
+MAX_PROBLEMS_SHOWN = 2000  # filas de la ventana de problemas
+MAX_DIFF_SHOWN = 2000  # celdas de la vista previa de fórmulas y filas de la comparación y conflictos
+MAX_ANALYSIS_SHOWN = 2000  # filas de las tablas de monsters y atípicos del análisis
+DIFF_SYMBOLS = {"changed": "~", "added": "+", "removed": "-"}
+FORMULA_SCOPES = ("Seleccionados", "Resultado de la búsqueda", "Filtro por rangos", "Todos")
+
 class MonsterEditorApp:
-    def __init__(self, master):
+    def __init__(self, master, startup_log=None):
         self.master = master
         self.master.title("🐉 Monster Editor - TuServerMU.com.ve by Azzlaer")
         self.master.geometry("1200x720")
 
-        # Load initial data
-        self.header, self.monsters, self.footer = load_file()
-
-        # Map index->monster for quick find (Index as string)
-        self.index_map = {m[0]: m for m in self.monsters}
+        # Initial data: tabla vacía; el archivo se carga en segundo plano
+        self.header, self.monsters, self.footer = [], MonsterTable(), []
+        self._job = None  # BackgroundJob en curso
+        self.history = EditHistory()
+        self.current_edit_idx = None  # fila cargada en el formulario
+        self.validator = TableValidator(self.monsters)
+        self._problems_win = None  # ventana de problemas abierta (o None)
+        self._formula_win = None
+        self._formula_pending = None  # (clave, Formula, FormulaResult) de la última vista previa
+        self._diff_win = None
+        self._diff_other = None  # (ruta, MonsterTable) del archivo con el que se compara
+        self._diff_entries = []
+        # versión del archivo en disco (base de la mezcla a tres bandas) y conflictos pendientes
+        self._disk_base = MonsterTable()
+        self._conflicts = []
+        self._conflicts_win = None
+        # análisis de balance: solo se calcula mientras su ventana está abierta
+        self.analysis = None
+        self._analysis_win = None
+        self._analysis_ref = {}  # resúmenes por perfil con los que se comparan los Δ
+        self._profiles = list(DEFAULT_PROFILES)
+        self.watcher = FileWatcher(self.master, FILE_PATH, self._disk_changed)
 
         # Top bar
         self._build_topbar()
@@ -132,16 +2509,34 @@ class MonsterEditorApp:
         # Left: buscador + lista de checkboxes
         self._build_left(left_frame)
 
-        # Center: formulario de edición
-        self._build_center(center_frame)
+        # Center (formulario) y right (porcentajes) tienen decenas de widgets:
+        # se construyen justo después de que la ventana aparece
+        self._startup = {}  # tiempos de arranque en ms (ver _first_paint)
+        self._startup_log = startup_log
+        self.master.after(0, lambda: self._first_paint(center_frame, right_frame))
 
-        # Right: controles para aplicar porcentaje
-        self._build_right(right_frame)
+        # Status bar (+ progreso / cancelar de las operaciones de archivo)
+        status_frame = ttk.Frame(self.master)
+        status_frame.pack(fill="x", side="bottom")
+        self.status_var = tk.StringVar(value="")
+        status = ttk.Label(status_frame, textvariable=self.status_var, anchor="w")
+        status.pack(side="left", fill="x", expand=True)
+        self.progress_var = tk.DoubleVar(value=0)
+        self.progress_bar = ttk.Progressbar(status_frame, variable=self.progress_var, maximum=100, length=180)
+        self.cancel_btn = ttk.Button(status_frame, text="✖ Cancelar", bootstyle="danger-link", command=self.cancel_io)
+        # métricas en vivo (opcionales): clic en el texto abre el detalle
+        self.metrics_var = tk.StringVar(value="")
+        ttk.Button(status_frame, text="⏱", bootstyle="secondary-link", command=self.toggle_metrics).pack(side="right")
+        metrics_label = ttk.Label(status_frame, textvariable=self.metrics_var, foreground="#9aa", cursor="hand2")
+        metrics_label.pack(side="right", padx=6)
+        metrics_label.bind("<Button-1>", lambda e: self.show_metrics())
+        self._metrics_win = None
+        self._profiler = None  # cProfile.Profile en curso (o None)
+        self._metrics_job = None  # after() del refresco de métricas
+        if METRICS.enabled:
+            self._update_metrics()
 
-        # Status bar
-        self.status_var = tk.StringVar(value=f"Monsters cargados: {len(self.monsters)}")
-        status = ttk.Label(self.master, textvariable=self.status_var, anchor="w")
-        status.pack(fill="x", side="bottom")
+        self._load_async(f"Cargando '{FILE_PATH}'…")
 
     def _build_topbar(self):
         top = ttk.Frame(self.master, padding=8)
@@ -159,6 +2554,137 @@ class MonsterEditorApp:
         btn_reload = ttk.Button(top, text="🔄 Recargar", bootstyle="secondary", command=self.reload_file)
         btn_reload.pack(side="right", padx=6)
 
+        self.problems_btn = ttk.Button(top, text="⚠ Problemas (0)", bootstyle="warning-outline", command=self.show_problems)
+        self.problems_btn.pack(side="right", padx=6)
+
+        ttk.Button(top, text="🔀 Comparar…", bootstyle="info-outline", command=self.compare_with_file).pack(side="right", padx=6)
+        ttk.Button(top, text="📊 Análisis", bootstyle="info-outline", command=self.show_analysis).pack(side="right", padx=6)
+
+        ttk.Button(top, text="↷ Rehacer", bootstyle="outline", command=self.redo).pack(side="right", padx=2)
+        ttk.Button(top, text="↶ Deshacer", bootstyle="outline", command=self.undo).pack(side="right", padx=2)
+        self.master.bind("<Control-z>", lambda e: self._undo_shortcut(self.undo))
+        self.master.bind("<Control-y>", lambda e: self._undo_shortcut(self.redo))
+        self.master.bind("<Control-Z>", lambda e: self._undo_shortcut(self.redo))  # Ctrl+Shift+Z
+
+    # ---------------- arranque ----------------
+    def _first_paint(self, center_frame, right_frame):
+        self.master.update_idletasks()  # dibuja la ventana con la barra superior y la lista
+        now = time.perf_counter()
+        self._startup["first_paint_ms"] = (now - STARTUP_T0) * 1000
+        self._build_center(center_frame)
+        self._build_right(right_frame)
+        self._startup["panels_ms"] = (time.perf_counter() - now) * 1000
+        if METRICS.enabled:
+            METRICS.record("first_paint", STARTUP_T0, now - STARTUP_T0)
+
+    def _startup_loaded(self):
+        """Tras la primera carga: completa los tiempos de arranque y los anota en --startup-log."""
+        if "data_ms" in self._startup:
+            return
+        self._startup["data_ms"] = (time.perf_counter() - STARTUP_T0) * 1000
+        if not self._startup_log:
+            return
+        entry = dict(self._startup, date=time.strftime("%Y-%m-%d %H:%M:%S"),
+                     frozen=bool(getattr(sys, "frozen", False)), rows=self.monsters.live_count())
+        try:
+            with open(self._startup_log, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError:
+            pass  # el registro de arranque no debe impedir usar el editor
+
+    # ---------------- deshacer / rehacer ----------------
+    def _undo_shortcut(self, action):
+        # dentro de un campo de texto Ctrl+Z es del campo, no de la tabla
+        if not isinstance(self.master.focus_get(), (tk.Entry, ttk.Entry, tk.Text)):
+            action()
+
+    def undo(self):
+        if not self.history.can_undo():
+            self.status_var.set("Nada para deshacer.")
+            return
+        label, effect = self.history.undo(self.monsters)
+        self._after_history(effect)
+        self.status_var.set(f"Deshecho: {label}")
+
+    def redo(self):
+        if not self.history.can_redo():
+            self.status_var.set("Nada para rehacer.")
+            return
+        label, effect = self.history.redo(self.monsters)
+        self._after_history(effect)
+        self.status_var.set(f"Rehecho: {label}")
+
+    def _after_history(self, effect):
+        rows, cols = effect
+        rows = sorted(rows)
+        for row in rows:
+            if not self.monsters.is_alive(row):
+                self.selection.set(row, False)
+        self._table_changed(rows=rows, cols=None if cols is None else sorted(cols))
+        if self.current_edit_idx in rows:
+            if self.monsters.is_alive(self.current_edit_idx):
+                self.open_editor_window(self.current_edit_idx)
+            else:
+                self._clear_form()
+
+    def _clear_form(self):
+        self.current_edit_idx = None
+        self.current_index_var.set("Ninguno seleccionado")
+
+    # ---------------- problemas de validación ----------------
+    def _update_problems(self):
+        self.problems_btn.configure(text=f"⚠ Problemas ({self.validator.count()})")
+        if self._problems_win is not None:
+            self._fill_problems()
+
+    def show_problems(self):
+        if self._problems_win is not None:
+            self._problems_win.lift()
+            return
+        win = tk.Toplevel(self.master)
+        win.title("⚠ Problemas en los datos")
+        win.geometry("720x420")
+        self._problems_info = tk.StringVar()
+        ttk.Label(win, textvariable=self._problems_info, padding=6).pack(fill="x")
+        frame = ttk.Frame(win)
+        frame.pack(fill="both", expand=True, padx=6, pady=(0,6))
+        tree = ttk.Treeview(frame, columns=("index", "name", "col", "problem"), show="headings")
+        for key, text, width in (("index", "Index", 70), ("name", "Monster", 170), ("col", "Columna", 110), ("problem", "Problema", 340)):
+            tree.heading(key, text=text)
+            tree.column(key, width=width, anchor="w")
+        sb = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=sb.set)
+        tree.pack(side="left", fill="both", expand=True)
+        sb.pack(side="right", fill="y")
+        tree.tag_configure("aviso", foreground="#c90")
+        # el iid de cada fila del árbol es "fila:n" -> doble clic abre el monster
+        tree.bind("<Double-1>", lambda e: self._open_problem_row(tree.focus()))
+        win.protocol("WM_DELETE_WINDOW", self._close_problems)
+        self._problems_win, self._problems_tree = win, tree
+        self._fill_problems()
+
+    def _fill_problems(self):
+        tree = self._problems_tree
+        tree.delete(*tree.get_children())
+        problems = self.validator.problems()
+        for n, p in enumerate(problems[:MAX_PROBLEMS_SHOWN]):
+            tree.insert("", "end", iid=f"{p.row}:{n}", tags=(p.severity,), values=(
+                self.monsters.cell(p.row, INDEX_COL), self.monsters.cell(p.row, NAME_COL),
+                COLUMNS[p.col], p.message,
+            ))
+        info = f"{len(problems)} problemas ({self.validator.count('error')} errores)"
+        if len(problems) > MAX_PROBLEMS_SHOWN:
+            info += f" · se muestran los primeros {MAX_PROBLEMS_SHOWN}"
+        self._problems_info.set(info + " · doble clic para editar")
+
+    def _open_problem_row(self, iid):
+        if iid:
+            self.open_editor_window(int(iid.split(":")[0]))
+
+    def _close_problems(self):
+        self._problems_win.destroy()
+        self._problems_win = None
+
     # ---------------- left: buscador + list of checkboxes ----------------
     def _build_left(self, parent):
         # Buscador
@@ -168,25 +2694,22 @@ class MonsterEditorApp:
         self.search_var = tk.StringVar()
         search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
         search_entry.pack(side="left", fill="x", expand=True, padx=(6,0))
-        search_entry.bind("<KeyRelease>", lambda e: self._refresh_monster_list())
-
-        # Scrollable container for checkboxes
-        box_frame = ttk.Frame(parent)
-        box_frame.pack(fill="both", expand=True)
-
-        canvas = tk.Canvas(box_frame, borderwidth=0, highlightthickness=0)
-        scrollbar = ttk.Scrollbar(box_frame, orient="vertical", command=canvas.yview)
-        self.checks_container = ttk.Frame(canvas)
+        # se agrupan las pulsaciones: una sola pasada de filtro al dejar de teclear
+        self._search_job = None
+        search_entry.bind("<KeyRelease>", lambda e: self._schedule_search())
 
-        self.checks_container.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+        # Lista virtualizada: solo se dibujan las filas visibles; la selección
+        # vive en self.selection y sobrevive a búsquedas y refrescos
+        self.selection = SelectionModel(len(self.monsters))
+        self._visible_mask = None  # máscara de filas filtradas (None = todas)
+        self.monster_list = VirtualMonsterList(
+            parent,
+            selection=self.selection,
+            get_label=self._monster_label,
+            on_double_click=self.open_editor_window,
+            on_toggle=lambda row: self._show_selection_count(),
         )
-        canvas.create_window((0,0), window=self.checks_container, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        self.monster_list.pack(fill="both", expand=True)
 
         # Buttons: seleccionar todo / ninguno / invertir
         btn_frame = ttk.Frame(parent)
@@ -195,39 +2718,107 @@ class MonsterEditorApp:
         ttk.Button(btn_frame, text="❌ Deseleccionar", bootstyle="light", command=self.clear_all).pack(side="left", expand=True, padx=2)
         ttk.Button(btn_frame, text="🔁 Invertir", bootstyle="outline", command=self.invert_selection).pack(side="left", expand=True, padx=2)
 
-        # Build checkbuttons initially
-        self.checkbox_vars = []  # list of (var,index)
+        # Filtro por rangos de stats -> alimenta la selección
+        query_frame = ttk.Frame(parent)
+        query_frame.pack(fill="x", pady=(0,6))
+        ttk.Label(query_frame, text="🧮 Filtro:").pack(side="left")
+        self.query_var = tk.StringVar()
+        query_entry = ttk.Entry(query_frame, textvariable=self.query_var)
+        query_entry.pack(side="left", fill="x", expand=True, padx=(6,0))
+        query_entry.bind("<Return>", lambda e: self.select_by_query())
+        ttk.Button(query_frame, text="✅", bootstyle="info", width=3, command=self.select_by_query).pack(side="left", padx=(4,0))
+        ttk.Button(query_frame, text="➕", bootstyle="outline", width=3, command=lambda: self.select_by_query(add=True)).pack(side="left", padx=(2,0))
+
+        # Build list initially
+        self.search_index = SearchIndex(self.monsters)
+        self.column_indexes = ColumnIndexes(self.monsters)
+        self._refresh_monster_list()
+
+    def _monster_label(self, idx):
+        return monster_label(self.monsters, idx)
+
+    def _schedule_search(self):
+        if self._search_job is not None:
+            self.master.after_cancel(self._search_job)
+        self._search_job = self.master.after(SEARCH_DEBOUNCE_MS, self._run_search)
+
+    def _run_search(self):
+        self._search_job = None
         self._refresh_monster_list()
 
+    @instrumented("refresh_list")
     def _refresh_monster_list(self):
-        # clear container
-        for widget in self.checks_container.winfo_children():
-            widget.destroy()
-        self.checkbox_vars.clear()
-
-        query = self.search_var.get().lower().strip()
-        for i, m in enumerate(self.monsters):
-            display = f"[{m[0]}] {m[2]} (Lv {m[3]})"
-            if query and query not in display.lower():
-                continue
-            var = tk.BooleanVar(value=False)
-            cb = ttk.Checkbutton(self.checks_container, text=display, variable=var)
-            cb.pack(anchor="w", pady=1, padx=4)
-            # bind left click to open editor on double-click (simulated)
-            cb.bind("<Double-Button-1>", lambda e, idx=i: self.open_editor_window(idx))
-            self.checkbox_vars.append((var, i))
+        # solo se recalcula qué filas pasan el filtro; los widgets se reutilizan
+        rows = self.search_index.search(self.search_var.get())
+        if rows is not None:
+            self._visible_mask = SelectionModel.mask_for(rows, len(self.monsters))
+        else:
+            rows = self.monsters.live_rows()
+            # sin filtro, la máscara de visibles es la de filas vivas
+            self._visible_mask = bytes(self.monsters.alive) if self.monsters.dead else None
+        self.monster_list.set_rows(rows)
+
+    @instrumented("table_changed")
+    def _table_changed(self, rows=None, cols=None):
+        """
+        Mantiene los índices tras modificar self.monsters y refresca la lista.
+        rows=None: cambio masivo o estructural (altas/bajas); cols=None: todas.
+        """
+        if cols is None or any(c in LABEL_COLS for c in cols):
+            if rows is None:
+                self.search_index.rebuild(self.monsters)
+            else:
+                for r in rows:
+                    self.search_index.update(r)
+        if rows is None and cols is None:
+            # las filas pueden haber cambiado de posición: se recrean al usarse
+            self.column_indexes.reset(self.monsters)
+        else:
+            self.column_indexes.rows_changed(rows, cols)
+        if rows is None and cols is None:
+            self.validator.validate_all(self.monsters)
+        else:
+            self.validator.revalidate(rows, cols)
+        self._refresh_monster_list()
+        self._update_problems()
+        if self.analysis is not None:
+            self._update_analysis(rows, cols)
+
+    def select_by_query(self, add=False):
+        """Selecciona los monsters que cumplen el filtro (add=True: suma a la selección)."""
+        text = self.query_var.get().strip()
+        if not text:
+            return
+        try:
+            rows = self.column_indexes.query(parse_query(text))
+        except QueryError as e:
+            messagebox.showerror("Filtro inválido", f"{e}\nEjemplo: Level>=80 AND MaxLife<50000 AND AttackType==2")
+            return
+        if not add:
+            self.selection.clear()
+        self.selection.select_all(SelectionModel.mask_for(rows, len(self.monsters)))
+        self._after_selection_change()
+        self.status_var.set(f"Filtro: {len(rows)} coincidencias · Seleccionados: {self.selection.count()} de {self.monsters.live_count()}")
 
+    # select/clear/invert actúan sobre las filas visibles (las del filtro actual)
     def select_all(self):
-        for var, _ in self.checkbox_vars:
-            var.set(True)
+        self.selection.select_all(self._visible_mask)
+        self._after_selection_change()
 
     def clear_all(self):
-        for var, _ in self.checkbox_vars:
-            var.set(False)
+        self.selection.clear(self._visible_mask)
+        self._after_selection_change()
 
     def invert_selection(self):
-        for var, _ in self.checkbox_vars:
-            var.set(not var.get())
+        self.selection.invert(self._visible_mask)
+        self._after_selection_change()
+
+    def _after_selection_change(self):
+        self.monster_list.redraw()
+        self._show_selection_count()
+
+    def _show_selection_count(self):
+        self.status_var.set(f"Seleccionados: {self.selection.count()} de {self.monsters.live_count()}")
 
     # ---------------- center: formulario de edición ----------------
     def _build_center(self, parent):
@@ -274,10 +2865,7 @@ class MonsterEditorApp:
         ttk.Button(btns, text="🗑 Eliminar seleccionado", bootstyle="danger", command=self.delete_selected_monster).pack(side="left", padx=6)
 
     def _get_first_checked_index(self):
-        for var, idx in self.checkbox_vars:
-            if var.get():
-                return idx
-        return None
+        return self.selection.first()
 
     def load_selected_into_form(self):
         idx = self._get_first_checked_index()
@@ -287,12 +2875,11 @@ class MonsterEditorApp:
         self.open_editor_window(idx)
 
     def open_editor_window(self, monster_idx):
-        # monster_idx is index in self.monsters
-        try:
-            m = self.monsters[monster_idx]
-        except IndexError:
+        # monster_idx is the row id in self.monsters
+        if not (0 <= monster_idx < len(self.monsters)) or not self.monsters.is_alive(monster_idx):
             messagebox.showerror("Error", "Monster no encontrado.")
             return
+        m = self.monsters[monster_idx]
 
         # populate form entries in center with the monster data
         for i, col in enumerate(COLUMNS):
@@ -315,31 +2902,35 @@ class MonsterEditorApp:
             if col == "Name":
                 val = val.strip('"')
             newrow.append(val if val != "" else "0")
+        other = self.monsters.row_for_index(newrow[0])
+        if other is not None and other != self.current_edit_idx:
+            if not messagebox.askyesno(
+                "Index duplicado",
+                f"El Index {newrow[0]} ya lo usa [{newrow[0]}] {self.monsters.cell(other, NAME_COL)}. ¿Guardar igualmente?",
+            ):
+                return
         # replace
-        self.monsters[self.current_edit_idx] = newrow
+        with self.history.record(self.monsters, f"editar [{newrow[0]}] {newrow[2]}"):
+            self.monsters.set_row(self.current_edit_idx, newrow)
         # refresh left list display (names/levels might have changed)
-        self._refresh_monster_list()
-        self.status_var.set(f"Guardado monster [{newrow[0]}] {newrow[2]}")
+        self._table_changed(rows=[self.current_edit_idx])
+        msg = f"Guardado monster [{newrow[0]}] {newrow[2]} · {self.monsters.dirty_count()} filas con cambios sin guardar"
+        problems = self.validator.row_problems(self.current_edit_idx)
+        if problems:
+            msg += " · ⚠ " + "; ".join(p.message for p in problems)
+        self.status_var.set(msg)
         messagebox.showinfo("Guardado", "Cambios guardados para el monster en memoria. Recuerda 'Guardar Todo' para escribir el archivo.")
 
     def add_new_monster(self):
         # Create a new monster with default values and open in form
-        new_index = 0
-        if self.monsters:
-            # compute next index as max existing + 1
-            try:
-                existing = [int(m[0]) for m in self.monsters]
-                new_index = max(existing) + 1
-            except:
-                new_index = len(self.monsters)
+        # next index = max existing + 1 (mantenido por la tabla, sin recorrerla)
+        new_index = self.monsters.next_index()
         newrow = [str(new_index), "1", f"New Monster {new_index}"] + ["0"] * (len(COLUMNS)-3)
-        self.monsters.append(newrow)
-        self._refresh_monster_list()
+        with self.history.record(self.monsters, f"agregar [{new_index}]"):
+            row = self.monsters.append_row(newrow)
         # select the new one
-        # set its checkbox var to True if present
-        for var, idx in self.checkbox_vars:
-            if idx == len(self.monsters)-1:
-                var.set(True)
+        self.selection.append(True)
+        self._table_changed(rows=[row])
         messagebox.showinfo("Nuevo", f"Monster creado con Index {new_index}. Selecciónalo y edítalo en el formulario.")
 
     def delete_selected_monster(self):
@@ -349,9 +2940,13 @@ class MonsterEditorApp:
             return
         m = self.monsters[idx]
         if messagebox.askyesno("Confirmar eliminación", f"¿Eliminar [{m[0]}] {m[2]}?"):
-            del self.monsters[idx]
-            # refresh map and lists
-            self._refresh_monster_list()
+            with self.history.record(self.monsters, f"eliminar [{m[0]}] {m[2]}"):
+                self.monsters.delete_row(idx)
+            # los ids de las demás filas no cambian: solo se actualiza esta
+            self.selection.set(idx, False)
+            if self.current_edit_idx == idx:
+                self._clear_form()
+            self._table_changed(rows=[idx])
             self.status_var.set(f"Monster [{m[0]}] eliminado (aún no guardado en archivo).")
 
     # ---------------- right: porcentaje / select fields ----------------
@@ -393,6 +2988,7 @@ class MonsterEditorApp:
         # Apply to selected monsters button
         ttk.Button(parent, text="▶ Aplicar a monsters seleccionados", bootstyle="primary", command=self.apply_percentage_to_selected).pack(fill="x", pady=(8,4))
         ttk.Button(parent, text="▶ Aplicar a todos los monsters", bootstyle="warning", command=self.apply_percentage_to_all).pack(fill="x", pady=(2,4))
+        ttk.Button(parent, text="🧮 Fórmulas…", bootstyle="info-outline", command=self.open_formula_window).pack(fill="x", pady=(2,4))
 
         ttk.Separator(parent).pack(fill="x", pady=8)
         ttk.Label(parent, text="Vista rápida (monster seleccionado):").pack(anchor="w")
@@ -404,7 +3000,7 @@ class MonsterEditorApp:
             v.set(val)
 
     def _get_checked_monster_indices(self):
-        return [idx for var, idx in self.checkbox_vars if var.get()]
+        return self.selection.indices()
 
     def apply_percentage_to_selected(self):
         checked = self._get_checked_monster_indices()
@@ -414,8 +3010,7 @@ class MonsterEditorApp:
         self._apply_percentage_to_indices(checked)
 
     def apply_percentage_to_all(self):
-        indices = list(range(len(self.monsters)))
-        self._apply_percentage_to_indices(indices)
+        self._apply_percentage_to_indices(None)
 
     def _apply_percentage_to_indices(self, indices):
         # Get percentage
@@ -425,6 +3020,9 @@ class MonsterEditorApp:
             messagebox.showerror("Error", "Porcentaje inválido. Usa un número, p.ej. 20")
             return
         factor = 1 + pct / 100.0
+        if not math.isfinite(factor):
+            messagebox.showerror("Error", "Porcentaje inválido. Usa un número, p.ej. 20")
+            return
 
         # get selected attributes as column names
         selected_attrs = [col for col, var in self.attr_vars.items() if var.get()]
@@ -435,44 +3033,24 @@ class MonsterEditorApp:
         # map col -> index in COLUMNS
         attr_indices = [COLUMNS.index(col) for col in selected_attrs]
 
-        # apply
-        affected = 0
-        for i in indices:
-            row = self.monsters[i]
-            changed = False
-            for ci in attr_indices:
-                try:
-                    # try parse as float/int; preserve integer if original integer
-                    orig = row[ci]
-                    # If it's name-like, skip
-                    if ci == 2:
-                        continue
-                    # allow integers and floats
-                    val = float(orig)
-                    newval = val * factor
-                    # round: if original had no decimal, store int
-                    if float(int(val)) == val:
-                        newstr = str(int(round(newval)))
-                    else:
-                        # keep two decimals for floats
-                        newstr = f"{newval:.2f}"
-                    row[ci] = newstr
-                    changed = True
-                except Exception:
-                    # ignore non-numeric fields
-                    continue
-            if changed:
-                affected += 1
-
-        self._refresh_monster_list()
+        # apply (una operación por columna sobre las filas indicadas; None = todas)
+        # se mide sin los diálogos, que esperan al usuario
+        with METRICS.timed("apply_percentage"):
+            with self.history.record(self.monsters, f"{pct}% en {', '.join(selected_attrs)}"):
+                affected = self.monsters.scale_columns(indices, attr_indices, factor)
+            self._table_changed(rows=indices, cols=attr_indices)
         self.status_var.set(f"Ajustado {pct}% a {affected} monsters en {', '.join(selected_attrs)}")
         messagebox.showinfo("Aplicado", f"Se aplicó {pct}% a {affected} monsters en {len(selected_attrs)} atributos.\nRecuerda guardar para persistir en archivo.")
 
         # update preview if any one selected for preview
-        first_idx = indices[0] if indices else None
+        if indices is None:
+            first_idx = next(iter(self.monsters.live_rows()), None)
+        else:
+            first_idx = indices[0] if indices else None
         if first_idx is not None:
             self._show_preview(first_idx)
 
+    @instrumented("show_preview")
     def _show_preview(self, idx):
         self.preview_txt.configure(state="normal")
         self.preview_txt.delete("1.0", "end")
@@ -484,20 +3062,1316 @@ class MonsterEditorApp:
             self.preview_txt.insert("end", "No hay preview disponible")
         self.preview_txt.configure(state="disabled")
 
+    # ---------------- fórmulas ----------------
+    def open_formula_window(self):
+        if self._formula_win is not None:
+            self._formula_win.lift()
+            return
+        win = tk.Toplevel(self.master)
+        win.title("🧮 Fórmulas")
+        win.geometry("760x560")
+        ttk.Label(win, padding=(6,6,6,0), foreground="#9aa", text=(
+            "Una asignación por línea (o separadas por ';'), ej:  MaxLife = Level**2 * 12 + 100\n"
+            f"Operadores + - * / // % **, =, +=, -=, *=, /= · Funciones: {', '.join(FORMULA_FUNCS)}"
+        )).pack(fill="x")
+        self.formula_txt = tk.Text(win, height=4)
+        self.formula_txt.pack(fill="x", padx=6, pady=6)
+
+        opts = ttk.Frame(win, padding=(6,0))
+        opts.pack(fill="x")
+        ttk.Label(opts, text="Redondeo:").pack(side="left")
+        self.formula_round_var = tk.StringVar(value="redondear")
+        ttk.Combobox(opts, textvariable=self.formula_round_var, values=list(ROUNDING_MODES), state="readonly", width=10).pack(side="left", padx=(4,10))
+        ttk.Label(opts, text="Mín:").pack(side="left")
+        self.formula_min_var = tk.StringVar()
+        ttk.Entry(opts, textvariable=self.formula_min_var, width=8).pack(side="left", padx=(4,10))
+        ttk.Label(opts, text="Máx:").pack(side="left")
+        self.formula_max_var = tk.StringVar()
+        ttk.Entry(opts, textvariable=self.formula_max_var, width=8).pack(side="left", padx=(4,10))
+        ttk.Label(opts, text="Aplicar a:").pack(side="left")
+        self.formula_scope_var = tk.StringVar(value=FORMULA_SCOPES[0])
+        ttk.Combobox(opts, textvariable=self.formula_scope_var, values=FORMULA_SCOPES, state="readonly", width=22).pack(side="left", padx=4)
+
+        btns = ttk.Frame(win, padding=6)
+        btns.pack(fill="x")
+        ttk.Button(btns, text="👁 Vista previa", bootstyle="secondary", command=self.preview_formula).pack(side="left", padx=(0,6))
+        ttk.Button(btns, text="✅ Aplicar", bootstyle="success", command=self.apply_formula).pack(side="left")
+        self.formula_info = tk.StringVar()
+        ttk.Label(btns, textvariable=self.formula_info).pack(side="left", padx=10)
+
+        frame = ttk.Frame(win)
+        frame.pack(fill="both", expand=True, padx=6, pady=(0,6))
+        tree = ttk.Treeview(frame, columns=("index", "name", "col", "old", "new"), show="headings")
+        for key, text, width in (("index", "Index", 70), ("name", "Monster", 180), ("col", "Columna", 120), ("old", "Antes", 110), ("new", "Después", 110)):
+            tree.heading(key, text=text)
+            tree.column(key, width=width, anchor="w")
+        sb = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=sb.set)
+        tree.pack(side="left", fill="both", expand=True)
+        sb.pack(side="right", fill="y")
+        win.protocol("WM_DELETE_WINDOW", self._close_formula)
+        self._formula_win, self._formula_tree = win, tree
+
+    def _close_formula(self):
+        self._formula_win.destroy()
+        self._formula_win = None
+        self._formula_pending = None
+
+    def _formula_rows(self, scope):
+        """Filas a las que se aplica la fórmula (None = todas las vivas)."""
+        if scope == "Seleccionados":
+            rows = self.selection.indices()
+            if not rows:
+                raise FormulaError("No hay monsters seleccionados")
+            return rows
+        if scope == "Resultado de la búsqueda":
+            rows = self.search_index.search(self.search_var.get())
+            return None if rows is None else sorted(rows)
+        if scope == "Filtro por rangos":
+            text = self.query_var.get().strip()
+            if not text:
+                raise FormulaError("Escribe un filtro en '🧮 Filtro' (panel izquierdo)")
+            try:
+                return self.column_indexes.query(parse_query(text))
+            except QueryError as e:
+                raise FormulaError(str(e)) from None
+        return None
+
+    def _formula_bound(self, var, label):
+        text = var.get().strip()
+        if not text:
+            return None
+        try:
+            return int(text)
+        except ValueError:
+            raise FormulaError(f"{label} debe ser un entero") from None
+
+    def _evaluate_formula(self):
+        """Compila y evalúa la fórmula de la ventana; reutiliza la vista previa si nada cambió."""
+        text = self.formula_txt.get("1.0", "end").strip()
+        rounding, scope = self.formula_round_var.get(), self.formula_scope_var.get()
+        lo = self._formula_bound(self.formula_min_var, "Mín")
+        hi = self._formula_bound(self.formula_max_var, "Máx")
+        key = (text, rounding, lo, hi, scope, self.search_var.get(), self.query_var.get(),
+               bytes(self.selection.bits), id(self.monsters), self.monsters.version)
+        if self._formula_pending is not None and self._formula_pending[0] == key:
+            return self._formula_pending[1:]
+        formula = Formula(text)
+        result = formula.evaluate(self.monsters, self._formula_rows(scope), rounding, lo, hi)
+        self._formula_pending = (key, formula, result)
+        return formula, result
+
+    def preview_formula(self):
+        try:
+            formula, result = self._evaluate_formula()
+        except FormulaError as e:
+            messagebox.showerror("Fórmula", str(e), parent=self._formula_win)
+            return
+        diff = Formula.diff(self.monsters, result)
+        tree = self._formula_tree
+        tree.delete(*tree.get_children())
+        for row, ci, old, new in diff[:MAX_DIFF_SHOWN]:
+            tree.insert("", "end", values=(
+                self.monsters.cell(row, INDEX_COL), self.monsters.cell(row, NAME_COL), COLUMNS[ci], old, new,
+            ))
+        info = f"{len(diff)} celdas cambiarían en {len({d[0] for d in diff})} monsters"
+        if result.skipped:
+            info += f" · {len(result.skipped)} saltados (valores no numéricos)"
+        if len(diff) > MAX_DIFF_SHOWN:
+            info += f" · se muestran las primeras {MAX_DIFF_SHOWN}"
+        self.formula_info.set(info)
+
+    def apply_formula(self):
+        try:
+            formula, result = self._evaluate_formula()
+        except FormulaError as e:
+            messagebox.showerror("Fórmula", str(e), parent=self._formula_win)
+            return
+        targets = [COLUMNS[ci] for ci in formula.targets]
+        with self.history.record(self.monsters, f"fórmula en {', '.join(targets)}"):
+            changed = Formula.apply(self.monsters, result)
+        self._formula_pending = None
+        self._table_changed(rows=changed, cols=formula.targets)
+        if self.current_edit_idx in changed:
+            self.open_editor_window(self.current_edit_idx)
+        self.status_var.set(f"Fórmula aplicada: {len(changed)} monsters modificados en {', '.join(targets)}")
+        self.preview_formula()
+
+    # ---------------- comparar / traer cambios ----------------
+    def compare_with_file(self):
+        path = filedialog.askopenfilename(
+            title="Comparar con otro Monster.txt",
+            filetypes=[("Monster.txt", "*.txt"), ("Todos", "*.*")],
+        )
+        if not path:
+            return
+        self._start_job(
+            f"Leyendo '{path}'…",
+            lambda progress, cancel: load_file(path, progress, cancel)[1],
+            lambda table: self._compare_loaded(path, table),
+            f"No se pudo leer '{path}'",
+        )
+
+    def _compare_loaded(self, path, table):
+        self._diff_other = (path, table)
+        if self._diff_win is None:
+            self._open_diff_window()
+        self._diff_win.title(f"🔀 Diferencias con {os.path.basename(path)}")
+        self._refresh_diff()
+
+    def _open_diff_window(self):
+        win = tk.Toplevel(self.master)
+        win.geometry("820x520")
+        btns = ttk.Frame(win, padding=6)
+        btns.pack(fill="x")
+        ttk.Button(btns, text="⬅ Traer seleccionados", bootstyle="primary", command=lambda: self.merge_diff_selection(False)).pack(side="left", padx=(0,6))
+        ttk.Button(btns, text="⬅ Traer todo", bootstyle="warning", command=lambda: self.merge_diff_selection(True)).pack(side="left", padx=(0,6))
+        ttk.Button(btns, text="🔄 Recalcular", bootstyle="secondary", command=self._refresh_diff).pack(side="left")
+        self.diff_info = tk.StringVar()
+        ttk.Label(win, textvariable=self.diff_info, padding=(6,0)).pack(fill="x")
+
+        frame = ttk.Frame(win)
+        frame.pack(fill="both", expand=True, padx=6, pady=6)
+        # una fila por monster y, dentro, una por celda cambiada; se puede traer
+        # la fila entera o solo algunas celdas (iid "n" o "n:columna")
+        tree = ttk.Treeview(frame, columns=("name", "mine", "other"), selectmode="extended")
+        tree.heading("#0", text="Index / Columna")
+        tree.column("#0", width=160)
+        for key, text, width in (("name", "Monster", 220), ("mine", "Actual", 180), ("other", "Otro archivo", 180)):
+            tree.heading(key, text=text)
+            tree.column(key, width=width, anchor="w")
+        sb = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=sb.set)
+        tree.pack(side="left", fill="both", expand=True)
+        sb.pack(side="right", fill="y")
+        win.protocol("WM_DELETE_WINDOW", self._close_diff)
+        self._diff_win, self._diff_tree = win, tree
+
+    def _close_diff(self):
+        self._diff_win.destroy()
+        self._diff_win = None
+        self._diff_other = None
+        self._diff_entries = []
+
+    def _refresh_diff(self):
+        path, other = self._diff_other
+        start = time.perf_counter()
+        entries = self._diff_entries = diff_tables(self.monsters, other)
+        elapsed = time.perf_counter() - start
+        tree = self._diff_tree
+        tree.delete(*tree.get_children())
+        for n, e in enumerate(entries[:MAX_DIFF_SHOWN]):
+            if e.kind == "added":
+                name, mine, theirs = other.cell(e.row_b, NAME_COL), "—", "nuevo"
+            else:
+                name = self.monsters.cell(e.row_a, NAME_COL)
+                mine, theirs = ("", "") if e.kind == "changed" else ("existe", "eliminado")
+            tree.insert("", "end", iid=str(n), text=f"{DIFF_SYMBOLS[e.kind]} [{e.key}]", values=(name, mine, theirs))
+            for ci, old, new in e.cells:
+                tree.insert(str(n), "end", iid=f"{n}:{ci}", text=COLUMNS[ci], values=("", old, new))
+        info = f"{diff_summary(entries)} · {elapsed * 1000:.0f} ms"
+        if len(entries) > MAX_DIFF_SHOWN:
+            info += f" · se muestran los primeros {MAX_DIFF_SHOWN}"
+        self.diff_info.set(info)
+
+    def merge_diff_selection(self, everything):
+        if self._diff_other is None:
+            return
+        entries = self._diff_entries
+        if everything:
+            picks = [(e, None) for e in entries]
+        else:
+            chosen = {}  # n -> columnas (None = fila entera)
+            for iid in self._diff_tree.selection():
+                n, _, ci = iid.partition(":")
+                n = int(n)
+                if not ci:
+                    chosen[n] = None
+                elif chosen.get(n, set()) is not None:
+                    chosen.setdefault(n, set()).add(int(ci))
+            picks = [(entries[n], cols) for n, cols in sorted(chosen.items())]
+        if not picks:
+            messagebox.showwarning("Nada seleccionado", "Selecciona filas o celdas de la lista.", parent=self._diff_win)
+            return
+        path, other = self._diff_other
+        with self.history.record(self.monsters, f"traer {len(picks)} cambios de {os.path.basename(path)}"):
+            touched, added = merge_diff(self.monsters, other, picks)
+        self._rows_merged(touched, added)
+        self.status_var.set(f"Traídos {len(picks)} cambios de '{path}' (aún no guardados en archivo).")
+        self._refresh_diff()
+
+    def _rows_merged(self, touched, added):
+        """Refresca selección, índices y formulario tras traer filas de otra tabla."""
+        for _ in added:
+            self.selection.append(False)
+        for row in touched:
+            if not self.monsters.is_alive(row):
+                self.selection.set(row, False)
+        self._table_changed(rows=sorted(touched))
+        if self.current_edit_idx in touched:
+            if self.monsters.is_alive(self.current_edit_idx):
+                self.open_editor_window(self.current_edit_idx)
+            else:
+                self._clear_form()
+
+    # ---------------- cambios externos en el archivo ----------------
+    def _disk_changed(self, signature):
+        if self._job is not None:
+            return False  # se reintenta cuando termine la operación en curso
+        base = self._disk_base
+        self._start_job(
+            f"'{FILE_PATH}' cambió fuera del editor, leyendo cambios…",
+            lambda progress, cancel: (file_signature(FILE_PATH), load_file(FILE_PATH, progress, cancel, base=base)),
+            self._external_loaded,
+            f"No se pudo leer '{FILE_PATH}' tras el cambio externo",
+        )
+        return True
+
+    def _external_loaded(self, result):
+        # solo se reparsean las líneas nuevas; los cambios del disco se mezclan
+        # con las ediciones sin guardar y, si chocan, gana la edición local
+        signature, (header, theirs, footer) = result
+        base, self._disk_base = self._disk_base, theirs
+        self.watcher.accept(signature)
+        self.header, self.footer = header, footer
+        entries, conflicts = three_way_merge(base, self.monsters, theirs)
+        if entries:
+            with self.history.record(self.monsters, "cambios externos"):
+                touched, added = merge_external(self.monsters, theirs, entries)
+            self._rows_merged(touched, added)
+        self._conflicts = conflicts
+        msg = f"'{FILE_PATH}' cambió fuera del editor: {len(entries)} monsters actualizados"
+        if conflicts:
+            msg += f" · {len(conflicts)} conflictos (se conservan tus cambios)"
+        self.status_var.set(msg)
+        if conflicts or self._conflicts_win is not None:
+            self.show_conflicts()
+
+    def show_conflicts(self):
+        if self._conflicts_win is None:
+            win = tk.Toplevel(self.master)
+            win.title("⚡ Conflictos con el archivo en disco")
+            win.geometry("820x420")
+            ttk.Label(win, padding=6, text=(
+                "Estas celdas cambiaron a la vez en el editor y en el disco. "
+                "Se conservaron tus valores; elige cuáles tomar del disco."
+            )).pack(fill="x")
+            btns = ttk.Frame(win, padding=(6,0))
+            btns.pack(fill="x")
+            ttk.Button(btns, text="⬅ Usar disco en seleccionados", bootstyle="warning", command=self.take_disk_versions).pack(side="left", padx=(0,6))
+            ttk.Button(btns, text="✔ Mantener los míos", bootstyle="success", command=self._close_conflicts).pack(side="left")
+            frame = ttk.Frame(win)
+            frame.pack(fill="both", expand=True, padx=6, pady=6)
+            tree = ttk.Treeview(frame, columns=("index", "col", "base", "mine", "disk"), show="headings", selectmode="extended")
+            for key, text, width in (("index", "Index", 90), ("col", "Columna", 130), ("base", "Antes", 150), ("mine", "Tuyo", 150), ("disk", "Disco", 150)):
+                tree.heading(key, text=text)
+                tree.column(key, width=width, anchor="w")
+            sb = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+            tree.configure(yscrollcommand=sb.set)
+            tree.pack(side="left", fill="both", expand=True)
+            sb.pack(side="right", fill="y")
+            win.protocol("WM_DELETE_WINDOW", self._close_conflicts)
+            self._conflicts_win, self._conflicts_tree = win, tree
+        tree = self._conflicts_tree
+        tree.delete(*tree.get_children())
+        for n, c in enumerate(self._conflicts[:MAX_DIFF_SHOWN]):
+            tree.insert("", "end", iid=str(n), values=(
+                c.key, "(fila)" if c.col is None else COLUMNS[c.col], c.base, c.mine, c.theirs,
+            ))
+
+    def _close_conflicts(self):
+        self._conflicts_win.destroy()
+        self._conflicts_win = None
+        self._conflicts = []
+
+    def take_disk_versions(self):
+        chosen = [self._conflicts[int(iid)] for iid in self._conflicts_tree.selection()]
+        if not chosen:
+            messagebox.showwarning("Nada seleccionado", "Selecciona conflictos de la lista.", parent=self._conflicts_win)
+            return
+        with self.history.record(self.monsters, f"usar disco en {len(chosen)} conflictos"):
+            touched, added = take_theirs(self.monsters, self._disk_base, chosen)
+        self._rows_merged(touched, added)
+        self._conflicts = [c for c in self._conflicts if c not in chosen]
+        self.show_conflicts()
+        self.status_var.set(f"Tomados {len(chosen)} valores del disco.")
+
+    # ---------------- análisis de balance ----------------
+    def show_analysis(self):
+        if self._analysis_win is not None:
+            self._analysis_win.lift()
+            return
+        self.analysis = BalanceAnalysis(self.monsters, self._profiles)
+        self._analysis_ref = self.analysis.summaries()
+        win = tk.Toplevel(self.master)
+        win.title("📊 Análisis de balance")
+        win.geometry("900x600")
+        btns = ttk.Frame(win, padding=6)
+        btns.pack(fill="x")
+        ttk.Button(btns, text="📌 Fijar referencia", bootstyle="secondary", command=self.set_analysis_reference).pack(side="left", padx=(0,6))
+        ttk.Button(btns, text="📂 Perfiles JSON…", bootstyle="info-outline", command=self.load_analysis_profiles).pack(side="left", padx=(0,6))
+        self._analysis_info = tk.StringVar()
+        ttk.Label(btns, textvariable=self._analysis_info, foreground="#9aa").pack(side="left", padx=6)
+
+        tabs = ttk.Notebook(win)
+        tabs.pack(fill="both", expand=True, padx=6, pady=(0,6))
+
+        # Simulación: resumen por perfil (+ diferencia con la referencia) y monsters del perfil elegido
+        sim = ttk.Frame(tabs, padding=6)
+        tabs.add(sim, text="⚔ Simulación")
+        self._summary_tree = self._analysis_tree(sim, (
+            ("ttk", "TTK mediano s", 100), ("ttk_d", "Δ ref", 70), ("p95", "TTK p95 s", 90),
+            ("taken", "Daño recibido", 100), ("deaths", "Muertes", 70),
+            ("drop", "Botín/min", 90), ("drop_d", "Δ ref", 70),
+        ), tree_label="Perfil", height=4, expand=False)
+        self._summary_tree.bind("<<TreeviewSelect>>", lambda e: self._pick_profile(self._summary_tree.focus()))
+
+        edit = ttk.Frame(sim)
+        edit.pack(fill="x", pady=6)
+        ttk.Label(edit, text="Perfil:").grid(row=0, column=0, sticky="w")
+        self._profile_vars = {"name": tk.StringVar()}
+        ttk.Entry(edit, textvariable=self._profile_vars["name"], width=12).grid(row=1, column=0, padx=(0,6))
+        for n, (key, label) in enumerate(PROFILE_FIELDS.items(), start=1):
+            ttk.Label(edit, text=label).grid(row=0, column=n, sticky="w")
+            self._profile_vars[key] = tk.StringVar()
+            ttk.Entry(edit, textvariable=self._profile_vars[key], width=9).grid(row=1, column=n, padx=(0,6))
+        col = len(PROFILE_FIELDS) + 1
+        ttk.Button(edit, text="💾 Guardar perfil", bootstyle="success-outline", command=self.save_analysis_profile).grid(row=1, column=col, padx=(0,6))
+        ttk.Button(edit, text="🗑", bootstyle="danger-outline", command=self.remove_analysis_profile).grid(row=1, column=col + 1)
+
+        opts = ttk.Frame(sim)
+        opts.pack(fill="x", pady=(0,4))
+        self._analysis_selected_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(opts, text="Solo seleccionados", variable=self._analysis_selected_var,
+                        command=self._fill_analysis_monsters).pack(side="left")
+        self._monsters_info = tk.StringVar()
+        ttk.Label(opts, textvariable=self._monsters_info, foreground="#9aa").pack(side="left", padx=10)
+        self._sim_tree = self._analysis_tree(sim, (
+            ("index", "Index", 70), ("name", "Monster", 170), ("level", "Level", 60),
+            ("ttk", "TTK s", 90), ("taken", "Daño recibido", 100), ("drop", "Botín", 80), ("per_min", "Botín/min", 90),
+        ))
+        self._sim_tree.bind("<Double-1>", lambda e: self._open_analysis_row(self._sim_tree.focus()))
+
+        # Distribuciones por columna
+        dist = ttk.Frame(tabs, padding=6)
+        tabs.add(dist, text="📈 Distribuciones")
+        self._dist_tree = self._analysis_tree(dist, (
+            ("n", "N", 60), ("min", "Mín", 80),
+            *((f"p{p}", f"p{p}", 80) for p in ANALYSIS_PERCENTILES),
+            ("max", "Máx", 80), ("mean", "Media", 80), ("stdev", "Desv.", 80),
+        ), tree_label="Columna")
+
+        # Curvas por tramo de Level
+        curves = ttk.Frame(tabs, padding=6)
+        tabs.add(curves, text="📉 Curvas por Level")
+        pick = ttk.Frame(curves)
+        pick.pack(fill="x", pady=(0,4))
+        ttk.Label(pick, text="Columna:").pack(side="left")
+        self._curve_col_var = tk.StringVar(value="MaxLife")
+        combo = ttk.Combobox(pick, textvariable=self._curve_col_var, state="readonly", width=14,
+                             values=[COLUMNS[ci] for ci in ANALYSIS_COLS if ci != LEVEL_COL])
+        combo.pack(side="left", padx=4)
+        combo.bind("<<ComboboxSelected>>", lambda e: self._fill_analysis_curve())
+        self._curve_tree = self._analysis_tree(curves, (
+            ("n", "N", 60), ("mean", "Media", 100), ("min", "Mín", 100), ("max", "Máx", 100), ("stdev", "Desv.", 100),
+        ), tree_label="Level")
+
+        # Atípicos respecto a su tramo de Level
+        outl = ttk.Frame(tabs, padding=6)
+        tabs.add(outl, text="❗ Atípicos")
+        self._outliers_info = tk.StringVar()
+        ttk.Label(outl, textvariable=self._outliers_info, foreground="#9aa").pack(fill="x", pady=(0,4))
+        self._outliers_tree = self._analysis_tree(outl, (
+            ("index", "Index", 70), ("name", "Monster", 170), ("level", "Level", 60), ("col", "Columna", 110),
+            ("value", "Valor", 90), ("expected", "Media del tramo", 110), ("z", "z", 60),
+        ))
+        self._outliers_tree.bind("<Double-1>", lambda e: self._open_analysis_row(self._outliers_tree.focus()))
+
+        win.protocol("WM_DELETE_WINDOW", self._close_analysis)
+        self._analysis_win = win
+        self._pick_profile(self._profiles[0].name if self._profiles else "")
+        self._fill_analysis()
+
+    def _analysis_tree(self, parent, columns, tree_label=None, height=None, expand=True):
+        frame = ttk.Frame(parent)
+        frame.pack(fill="both" if expand else "x", expand=expand)
+        tree = ttk.Treeview(frame, columns=[key for key, _, _ in columns],
+                            show="tree headings" if tree_label else "headings", height=height)
+        if tree_label:
+            tree.heading("#0", text=tree_label)
+            tree.column("#0", width=110)
+        for key, text, width in columns:
+            tree.heading(key, text=text)
+            tree.column(key, width=width, anchor="w" if key in ("name", "col") else "e")
+        sb = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=sb.set)
+        tree.pack(side="left", fill="both", expand=True)
+        sb.pack(side="right", fill="y")
+        return tree
+
+    @instrumented("analysis")
+    def _update_analysis(self, rows=None, cols=None):
+        if rows is None and cols is None:
+            self.analysis.refresh(self.monsters)
+        else:
+            self.analysis.update(rows, cols)
+        self._fill_analysis()
+
+    def _fill_analysis(self):
+        self._fill_analysis_summary()
+        self._fill_analysis_monsters()
+        self._fill_analysis_stats()
+        self._fill_analysis_curve()
+        self._fill_analysis_outliers()
+        self._analysis_info.set(
+            f"{self.monsters.live_count()} monsters · tramos de {LEVEL_BUCKET} niveles · "
+            f"{len(self._profiles)} perfiles · Δ respecto a la referencia fijada")
+
+    def _fill_analysis_summary(self):
+        tree = self._summary_tree
+        tree.delete(*tree.get_children())
+        for name, s in self.analysis.summaries().items():
+            if not s["monsters"]:
+                continue
+            ref = self._analysis_ref.get(name)
+            tree.insert("", "end", iid=name, text=name, values=(
+                format_number(s["ttk_median"]), _change_pct(ref and ref["ttk_median"], s["ttk_median"]),
+                format_number(s["ttk_p95"]), format_number(s["taken_median"]), s["deaths"],
+                format_number(s["drop_per_min_mean"]), _change_pct(ref and ref["drop_per_min_mean"], s["drop_per_min_mean"]),
+            ))
+
+    def _fill_analysis_monsters(self):
+        tree = self._sim_tree
+        tree.delete(*tree.get_children())
+        res = self.analysis.sim.get(self._profile_vars["name"].get())
+        if res is None:
+            self._monsters_info.set("Elige un perfil")
+            return
+        rows = self.selection.indices() if self._analysis_selected_var.get() else self.monsters.live_rows()
+        # los que más tardan en morir primero
+        rows = sorted(rows, key=res.ttk.__getitem__, reverse=True)
+        table = self.monsters
+        for i in rows[:MAX_ANALYSIS_SHOWN]:
+            tree.insert("", "end", iid=str(i), values=(
+                table.cell(i, INDEX_COL), table.cell(i, NAME_COL), table.cell(i, LEVEL_COL),
+                format_number(res.ttk[i]), format_number(res.taken[i]),
+                format_number(res.drop[i]), format_number(res.drop_per_min[i]),
+            ))
+        info = f"{len(rows)} monsters, de mayor a menor TTK"
+        if len(rows) > MAX_ANALYSIS_SHOWN:
+            info += f" · se muestran los primeros {MAX_ANALYSIS_SHOWN}"
+        self._monsters_info.set(info + " · doble clic para editar")
+
+    def _fill_analysis_stats(self):
+        tree = self._dist_tree
+        tree.delete(*tree.get_children())
+        for ci in ANALYSIS_COLS:
+            s = self.analysis.stats.get(ci)
+            if s is None:
+                continue
+            tree.insert("", "end", text=COLUMNS[ci], values=(
+                s.count, format_number(s.min), *(format_number(s.percentiles[p]) for p in ANALYSIS_PERCENTILES),
+                format_number(s.max), format_number(s.mean), format_number(s.stdev),
+            ))
+
+    def _fill_analysis_curve(self):
+        tree = self._curve_tree
+        tree.delete(*tree.get_children())
+        for p in self.analysis.curves.get(COL[self._curve_col_var.get()], ()):
+            tree.insert("", "end", text=f"{p.level}-{p.level + LEVEL_BUCKET - 1}", values=(
+                p.count, format_number(p.mean), format_number(p.min), format_number(p.max), format_number(p.stdev),
+            ))
+
+    def _fill_analysis_outliers(self):
+        tree = self._outliers_tree
+        tree.delete(*tree.get_children())
+        outliers = self.analysis.all_outliers()
+        table = self.monsters
+        for n, o in enumerate(outliers[:MAX_ANALYSIS_SHOWN]):
+            tree.insert("", "end", iid=f"{o.row}:{n}", values=(
+                table.cell(o.row, INDEX_COL), table.cell(o.row, NAME_COL), table.cell(o.row, LEVEL_COL),
+                COLUMNS[o.col], format_number(o.value), format_number(o.expected), f"{o.z:+.1f}",
+            ))
+        info = f"{len(outliers)} valores a más de {OUTLIER_Z:g} desviaciones de la media de su tramo de Level"
+        if len(outliers) > MAX_ANALYSIS_SHOWN:
+            info += f" · se muestran los primeros {MAX_ANALYSIS_SHOWN}"
+        self._outliers_info.set(info + " · doble clic para editar")
+
+    def _open_analysis_row(self, iid):
+        if iid:
+            self.open_editor_window(int(iid.split(":")[0]))
+
+    def set_analysis_reference(self):
+        self._analysis_ref = self.analysis.summaries()
+        self._fill_analysis_summary()
+        self.status_var.set("Referencia del análisis fijada: los Δ se miden desde ahora.")
+
+    def _pick_profile(self, name):
+        profile = next((p for p in self._profiles if p.name == name), None)
+        if profile is None:
+            return
+        for key, var in self._profile_vars.items():
+            value = getattr(profile, key)
+            var.set(f"{value:g}" if isinstance(value, float) else value)
+        if self._analysis_win is not None:
+            self._fill_analysis_monsters()
+
+    def save_analysis_profile(self):
+        fields = {key: var.get() for key, var in self._profile_vars.items()}
+        try:
+            profile = make_profile(fields.pop("name"), **fields)
+        except ProfileError as e:
+            messagebox.showerror("Perfil", str(e), parent=self._analysis_win)
+            return
+        names = [p.name for p in self._profiles]
+        if profile.name in names:
+            self._profiles[names.index(profile.name)] = profile
+        else:
+            self._profiles.append(profile)
+        self._set_profiles(self._profiles)
+
+    def remove_analysis_profile(self):
+        name = self._profile_vars["name"].get().strip()
+        profiles = [p for p in self._profiles if p.name != name]
+        if len(profiles) != len(self._profiles):
+            self._set_profiles(profiles)
+
+    def load_analysis_profiles(self):
+        path = filedialog.askopenfilename(title="Perfiles de personaje", filetypes=[("JSON", "*.json")],
+                                          parent=self._analysis_win)
+        if not path:
+            return
+        try:
+            profiles = load_profiles(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Perfiles", f"No se pudo leer '{path}':\n{e}", parent=self._analysis_win)
+            return
+        self._set_profiles(profiles)
+        self._pick_profile(profiles[0].name)
+
+    def _set_profiles(self, profiles):
+        self._profiles = list(profiles)
+        self.analysis.set_profiles(self._profiles)
+        # con otros perfiles los Δ anteriores ya no son comparables: nueva referencia
+        self._analysis_ref = self.analysis.summaries()
+        self._fill_analysis()
+
+    def _close_analysis(self):
+        self._analysis_win.destroy()
+        self._analysis_win = None
+        self.analysis = None  # sin ventana no se recalcula nada al editar
+
+    # ---------------- métricas ----------------
+    def toggle_metrics(self):
+        METRICS.enabled = not METRICS.enabled
+        if METRICS.enabled:
+            if self._metrics_job is None:
+                self._update_metrics()
+            self.status_var.set("Métricas activadas (clic en los tiempos para ver el detalle).")
+        else:
+            self.metrics_var.set("")
+            self.status_var.set("Métricas desactivadas.")
+
+    def _update_metrics(self):
+        if not METRICS.enabled:
+            self._metrics_job = None
+            return
+        parts = []
+        for name, label in METRICS_STATUS_OPS:
+            ms = METRICS.last_ms(name)
+            if ms is not None:
+                parts.append(f"{label} {ms:.1f} ms")
+        self.metrics_var.set("⏱ " + (" · ".join(parts) if parts else "sin datos aún"))
+        if self._metrics_win is not None:
+            self._fill_metrics()
+        self._metrics_job = self.master.after(METRICS_REFRESH_MS, self._update_metrics)
+
+    def show_metrics(self):
+        if self._metrics_win is not None:
+            self._metrics_win.lift()
+            return
+        win = tk.Toplevel(self.master)
+        win.title("⏱ Métricas")
+        win.geometry("640x360")
+        btns = ttk.Frame(win, padding=6)
+        btns.pack(fill="x")
+        ttk.Button(btns, text="🔄 Reiniciar", bootstyle="secondary", command=lambda: (METRICS.reset(), self._fill_metrics())).pack(side="left", padx=(0,6))
+        ttk.Button(btns, text="💾 Exportar JSON…", bootstyle="info", command=self.export_metrics).pack(side="left", padx=(0,6))
+        self.profile_btn = ttk.Button(btns, text="🧪 Iniciar cProfile", bootstyle="warning-outline", command=self.toggle_profiler)
+        self.profile_btn.pack(side="left")
+        if self._profiler is not None:
+            self.profile_btn.configure(text="🧪 Detener cProfile…")
+        cols = ("count", "total", "mean", "max", "last")
+        tree = ttk.Treeview(win, columns=cols, show="tree headings")
+        tree.heading("#0", text="Operación")
+        tree.column("#0", width=170)
+        for key, text in zip(cols, ("Llamadas", "Total ms", "Media ms", "Máx ms", "Última ms")):
+            tree.heading(key, text=text)
+            tree.column(key, width=85, anchor="e")
+        tree.pack(fill="both", expand=True, padx=6, pady=(0,6))
+        win.protocol("WM_DELETE_WINDOW", self._close_metrics)
+        self._metrics_win, self._metrics_tree = win, tree
+        self._fill_metrics()
+
+    def _fill_metrics(self):
+        tree = self._metrics_tree
+        tree.delete(*tree.get_children())
+        data = METRICS.snapshot()
+        for name, st in data["stats"].items():
+            tree.insert("", "end", text=name, values=(
+                st["count"], f"{st['total_ms']:.1f}", f"{st['mean_ms']:.2f}", f"{st['max_ms']:.1f}", f"{st['last_ms']:.2f}",
+            ))
+        for name, n in data["counters"].items():
+            tree.insert("", "end", text=name, values=(n, "", "", "", ""))
+
+    def _close_metrics(self):
+        self._metrics_win.destroy()
+        self._metrics_win = None
+
+    def export_metrics(self):
+        path = filedialog.asksaveasfilename(
+            title="Exportar métricas", defaultextension=".json",
+            filetypes=[("JSON", "*.json")], parent=self._metrics_win,
+        )
+        if path:
+            METRICS.dump(path)
+            self.status_var.set(f"Métricas exportadas a '{path}'.")
+
+    def toggle_profiler(self):
+        # cProfile mide el hilo de la ventana; la carga y el guardado van por métricas
+        if self._profiler is None:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+            self.profile_btn.configure(text="🧪 Detener cProfile…")
+            self.status_var.set("cProfile en marcha: usa el editor y luego detenlo para guardar el perfil.")
+            return
+        self._profiler.disable()
+        profiler, self._profiler = self._profiler, None
+        self.profile_btn.configure(text="🧪 Iniciar cProfile")
+        path = filedialog.asksaveasfilename(
+            title="Guardar perfil", defaultextension=".prof",
+            filetypes=[("cProfile", "*.prof")], parent=self._metrics_win,
+        )
+        if path:
+            profiler.dump_stats(path)
+            self.status_var.set(f"Perfil guardado en '{path}' (ábrelo con pstats o snakeviz).")
+
     # ---------------- file ops ----------------
+    def _start_job(self, label, fn, on_done, error_msg):
+        """Lanza fn(progress, cancel) en segundo plano mostrando progreso en la barra de estado."""
+        if self._job is not None:
+            messagebox.showwarning("Operación en curso", "Espera a que termine la operación de archivo actual (o cancélala).")
+            return False
+
+        def finish(result):
+            self._end_job()
+            on_done(result)
+
+        def fail(error):
+            self._end_job()
+            if isinstance(error, OperationCancelled):
+                self.status_var.set("Operación cancelada.")
+            else:
+                messagebox.showerror("Error", f"{error_msg}: {error}")
+                self.status_var.set(error_msg)
+
+        self.status_var.set(label)
+        self.progress_var.set(0)
+        self.cancel_btn.pack(side="right", padx=(0,6))
+        self.progress_bar.pack(side="right", padx=6)
+        self._job = BackgroundJob(self.master, fn, finish, fail,
+                                  on_progress=lambda p: self.progress_var.set(p * 100))
+        return True
+
+    def _end_job(self):
+        self._job = None
+        self.progress_bar.pack_forget()
+        self.cancel_btn.pack_forget()
+
+    def cancel_io(self):
+        if self._job is not None:
+            self._job.cancel()
+
     def save_all(self):
-        save_file(self.monsters, self.header, self.footer)
+        self.validator.validate_all(self.monsters)
+        self._update_problems()
+        errors = self.validator.count("error")
+        if errors and not messagebox.askyesno(
+            "Datos con problemas",
+            f"Hay {errors} problemas en los datos (ver '⚠ Problemas'). ¿Guardar igualmente?",
+        ):
+            return
+        if self.watcher.changed():
+            if not messagebox.askyesno(
+                "Archivo modificado",
+                f"'{FILE_PATH}' cambió fuera del editor y esos cambios aún no se trajeron.\n"
+                "¿Sobrescribirlo igualmente? (No = traer primero los cambios del disco)",
+            ):
+                self._disk_changed(file_signature(FILE_PATH))
+                return
+        # se guarda una copia: se puede seguir editando mientras se escribe
+        snapshot = self.monsters.copy()
+        header, footer = list(self.header), list(self.footer)
+
+        def save(progress, cancel):
+            rendered = save_file(snapshot, header, footer, FILE_PATH, progress, cancel)
+            return rendered, file_signature(FILE_PATH)
+
+        self._start_job(
+            f"Guardando '{FILE_PATH}'…",
+            save,
+            lambda result: self._save_done(result, snapshot),
+            f"No se pudo guardar '{FILE_PATH}'. El archivo original no se modificó",
+        )
+
+    def _save_done(self, result, snapshot):
+        rendered, signature = result
+        self.monsters.mark_saved(rendered)
+        # lo guardado pasa a ser la versión en disco (base de futuros cambios externos)
+        snapshot.mark_saved(rendered)
+        self._disk_base = snapshot
+        self.watcher.accept(signature)
         messagebox.showinfo("Guardado", f"Archivo '{FILE_PATH}' actualizado correctamente.")
-        self.status_var.set("Guardado en archivo.")
+        self.status_var.set(f"Guardado en archivo ({len(rendered)} filas reescritas, el resto copiadas tal cual).")
 
     def reload_file(self):
         if messagebox.askyesno("Recargar", "Recargará el archivo desde disco y perderás cambios no guardados. ¿Continuar?"):
-            self.header, self.monsters, self.footer = load_file()
-            self._refresh_monster_list()
-            self.status_var.set("Recargado desde archivo.")
+            self._load_async(f"Recargando '{FILE_PATH}'…")
+
+    def _load_async(self, label):
+        self._start_job(label, self._prepare_load, self._load_done, f"No se pudo leer '{FILE_PATH}'")
+
+    @staticmethod
+    def _prepare_load(progress, cancel):
+        """
+        En el hilo de I/O: carga la tabla y arma todo lo que depende de ella
+        (búsqueda, validación, copia del disco, IndexMap); la ventana todavía
+        no la ve, así que no hace falta sincronizar nada.
+        """
+        signature = file_signature(FILE_PATH)
+        loaded = load_file_cached(FILE_PATH, progress, cancel)
+        table = loaded[1]
+        table.index_map()
+        validator = TableValidator(table)
+        validator.validate_all()
+        return signature, loaded, SearchIndex(table), validator, table.copy()
+
+    def _load_done(self, result):
+        # todo se creó en el hilo de I/O: aquí solo se sustituyen las referencias
+        signature, (self.header, self.monsters, self.footer), self.search_index, self.validator, self._disk_base = result
+        self.column_indexes.reset(self.monsters)  # los índices por columna se crean al usarse
+        self.watcher.accept(signature)
+        if self._conflicts_win is not None:
+            self._close_conflicts()
+        # las entradas de la comparación apuntan a filas de la tabla anterior
+        if self._diff_win is not None:
+            self._refresh_diff()
+        else:
+            self._diff_entries = []
+        self.history.clear()
+        self._formula_pending = None  # la vista previa se calculó sobre la tabla anterior
+        if self.current_edit_idx is not None:
+            self._clear_form()  # el índice del formulario era de la tabla anterior
+        self.selection.reset(len(self.monsters))
+        self._refresh_monster_list()
+        self._update_problems()
+        if self.analysis is not None:
+            self._update_analysis()
+        self._startup_loaded()
+        self.status_var.set(self._loaded_message())
+        self._report_load_issues()
+
+    def _loaded_message(self):
+        stats = self.monsters.stats
+        msg = f"Monsters cargados: {self.monsters.live_count()}"
+        if stats:
+            msg += f" en {stats.seconds * 1000:.0f} ms ({stats.rows_per_sec:,.0f} filas/s)"
+            if stats.cached:
+                msg += " desde caché"
+        if self.monsters.issues:
+            msg += f" · {len(self.monsters.issues)} líneas con problemas"
+        dups = self.monsters.duplicate_indexes()
+        if dups:
+            msg += f" · {len(dups)} Index duplicados ({', '.join(list(dups)[:5])})"
+        if "first_paint_ms" in self._startup:
+            msg += f" · ventana en {self._startup['first_paint_ms']:.0f} ms"
+        return msg
+
+    def _report_load_issues(self):
+        issues = self.monsters.issues
+        if not issues:
+            return
+        lines = [f"Línea {p.lineno}: {p.reason}" for p in issues[:MAX_ISSUES_SHOWN]]
+        if len(issues) > MAX_ISSUES_SHOWN:
+            lines.append(f"... y {len(issues) - MAX_ISSUES_SHOWN} más")
+        messagebox.showwarning(
+            "Problemas al leer el archivo",
+            "Algunas líneas no se pudieron leer correctamente "
+            "(las inválidas se guardan tal cual, en el mismo lugar):\n\n" + "\n".join(lines),
+        )
+
+# ---------- benchmarks ----------
+# python main.py bench --sizes 1000,10000,100000 --json resultados.json --baseline anterior.json
+BENCH_SIZES = (1_000, 10_000, 100_000)
+BENCH_NAMES = ("Goblin", "Dragon", "Golem", "Spider", "Lich", "Hound", "Knight", "Witch", "Cyclops", "Balrog")
+BENCH_QUERIES = ("dra", "golem 12", "zzz")
+
+def synthetic_monster_rows(n, seed=0):
+    """n filas con la disposición de COLUMNS y valores plausibles (reproducibles con seed)."""
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        level = rnd.randint(1, 400)
+        dmg = level * rnd.randint(2, 6)
+        rows.append([
+            str(i), "1", f"{rnd.choice(BENCH_NAMES)} {i}", str(level),
+            str(level * level * rnd.randint(5, 15) + 100), str(rnd.randint(0, 500)),
+            str(dmg), str(dmg + rnd.randint(0, level)), str(level * rnd.randint(1, 4)),
+            str(rnd.randint(0, level)), str(level * rnd.randint(2, 6)), str(level * rnd.randint(1, 3)),
+            str(rnd.randint(0, 3)), str(rnd.randint(0, 2)), str(rnd.randint(1, 7)), str(rnd.randint(3, 9)),
+            "400", str(rnd.choice((1000, 1200, 1600, 2000))), str(rnd.randint(5, 60)), str(rnd.randint(0, 2)),
+            str(rnd.randint(0, 200)), str(rnd.randint(0, 100)), str(rnd.randint(0, 15)), str(rnd.randint(0, 60)),
+        ] + [str(rnd.randint(0, 20)) for _ in range(4)])
+    return rows
+
+def write_synthetic_file(path, n, seed=0):
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write("//" + "   ".join(COLUMNS) + "\n")
+        for row in synthetic_monster_rows(n, seed):
+            f.write(format_monster_line(row) + "\n")
+        f.write("end\n")
+
+def _best_time(fn, repeat, setup=None):
+    """Mejor tiempo (s) de repeat ejecuciones de fn(estado); setup() prepara el estado sin cronometrar."""
+    best = float("inf")
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        fn(state)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def _refresh_list_headless(table, search_index, query, visible=40):
+    """Lo que hace _refresh_monster_list sin Tk: filtrar, máscara de visibles y textos de la primera página."""
+    rows = search_index.search(query)
+    if rows is not None:
+        SelectionModel.mask_for(rows, len(table))
+    else:
+        rows = table.live_rows()
+    return [monster_label(table, i) for i in list(rows)[:visible]]
+
+def bench_size(n, repeat, workdir):
+    """Tiempos (s) de cada operación sobre una tabla sintética de n filas."""
+    path = os.path.join(workdir, f"Monster_{n}.txt")
+    write_synthetic_file(path, n)
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()[1:-1]
+    header, table, footer = load_file(path)
+    rows = [table[i] for i in range(len(table))]
+    pct_cols = [COL[c] for c in ("MaxLife", "Defense", "DamageMin", "DamageMax", "AttackRate")]
+    half = list(range(0, len(table), 2))
+    out = os.path.join(workdir, "out.txt")
+    search_index = SearchIndex(table)
+
+    def scaled(rows_):
+        t = table.copy()
+        t.scale_columns(rows_, pct_cols, 1.1)
+        return t
+
+    def cold_cache(_):
+        cache = cache_path_for(path)
+        if os.path.exists(cache):
+            os.remove(cache)
+
+    results = {
+        "parse_line": _best_time(lambda _: [parse_monster_line(ln) for ln in lines], repeat),
+        "load": _best_time(lambda _: load_file(path), repeat),
+        "load_cache_cold": _best_time(lambda _: load_file_cached(path), repeat, lambda: cold_cache(None)),
+        "load_cache_warm": _best_time(lambda _: load_file_cached(path), repeat),
+        "format": _best_time(lambda _: [format_monster_line(r) for r in rows], repeat),
+        "save_clean": _best_time(lambda _: save_file(table, header, footer, out), repeat),
+        "save_dirty": _best_time(lambda t: save_file(t, header, footer, out), repeat, lambda: scaled(None)),
+        "percentage_all": _best_time(lambda t: t.scale_columns(None, pct_cols, 1.1), repeat, table.copy),
+        "percentage_half": _best_time(lambda t: t.scale_columns(half, pct_cols, 1.1), repeat, table.copy),
+        "search_index": _best_time(lambda _: SearchIndex(table), repeat),
+        "search": _best_time(lambda _: [search_index.search(q) for q in BENCH_QUERIES], repeat,
+                             search_index._invalidate),
+        "query": _best_time(lambda _: ColumnIndexes(table).query(parse_query("Level>=80 AND MaxLife<500000")), repeat),
+        "refresh_list": _best_time(lambda _: _refresh_list_headless(table, search_index, ""), repeat),
+        "refresh_list_search": _best_time(lambda _: _refresh_list_headless(table, search_index, "golem"), repeat,
+                                          search_index._invalidate),
+        "validate": _best_time(lambda _: TableValidator(table).validate_all(), repeat),
+        "formula": _best_time(lambda _: Formula("MaxLife = Level**2 * 12 + 100; Defense *= 1 + Level/400").evaluate(table), repeat),
+        "diff": _best_time(lambda t: diff_tables(table, t), repeat, lambda: scaled(half)),
+        "analysis": _best_time(lambda _: BalanceAnalysis(table).summaries(), repeat),
+        "analysis_update": _best_time(lambda a: a.update(half, pct_cols), repeat, lambda: BalanceAnalysis(scaled(half))),
+    }
+    cold_cache(None)
+    return results
+
+def run_benchmarks(sizes=BENCH_SIZES, repeat=3, report=None):
+    """{"meta": {...}, "results": {"<filas>": {operación: segundos}}}"""
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="monsterz-bench-") as workdir:
+        for n in sizes:
+            results[str(n)] = bench_size(n, repeat, workdir)
+            if report:
+                report(n, results[str(n)])
+    meta = {"python": sys.version.split()[0], "platform": sys.platform, "repeat": repeat,
+            "date": time.strftime("%Y-%m-%d %H:%M:%S")}
+    return {"meta": meta, "results": results}
+
+BENCH_NOISE_S = 0.0005  # diferencias menores se consideran ruido
+
+def compare_benchmarks(current, baseline, threshold):
+    """[(filas, operación, antes, ahora, % de cambio)] de las operaciones que empeoraron más de threshold %."""
+    worse = []
+    for size, ops in current["results"].items():
+        for name, now in ops.items():
+            before = baseline.get("results", {}).get(size, {}).get(name)
+            if before and now - before > BENCH_NOISE_S and (now - before) / before * 100 > threshold:
+                worse.append((size, name, before, now, (now - before) / before * 100))
+    return worse
+
+# ---------- CLI (sin ventana) ----------
+# python main.py batch --pct 10 --cols MaxLife,Defense --where "Level>=80" --in-place a.txt b.txt
+# python main.py batch --formula "MaxLife = Level**2 * 12 + 100" --dry-run a.txt
+def parse_column_list(text):
+    """'MaxLife,Defense' -> posiciones en COLUMNS (solo numéricas, de Level en adelante). 'all' = todas."""
+    numeric = COLUMNS[3:]
+    if text.strip().lower() == "all":
+        return [COL[c] for c in numeric]
+    cols = []
+    for name in text.split(","):
+        ci = _COL_BY_LOWER.get(name.strip().lower())
+        if ci is None or COLUMNS[ci] not in numeric:
+            raise argparse.ArgumentTypeError(f"columna no válida para porcentaje: '{name.strip()}'")
+        cols.append(ci)
+    return cols
+
+def _count_problems(table):
+    validator = TableValidator(table)
+    validator.validate_all()
+    return validator.count()
+
+def _batch_one(path, opts):
+    """Procesa un archivo (se ejecuta en un proceso del pool). Devuelve un dict con el resultado."""
+    result = {"file": path, "ok": False}
+    try:
+        t0 = time.perf_counter()
+        header, table, footer = load_file(path)
+        t1 = time.perf_counter()
+
+        rows = None
+        if opts["where"]:
+            rows = ColumnIndexes(table).query(parse_query(opts["where"]))
+        if opts["formula"]:
+            evaluated = Formula(opts["formula"]).evaluate(table, rows, opts["rounding"], opts["min"], opts["max"])
+            affected = len(Formula.apply(table, evaluated))
+        else:
+            affected = table.scale_columns(rows, opts["cols"], 1 + opts["pct"] / 100.0)
+        t2 = time.perf_counter()
+
+        out = path
+        if opts["out_dir"]:
+            out = os.path.join(opts["out_dir"], os.path.basename(path))
+        changed = table.dirty_count()
+        if not opts["dry_run"]:
+            save_file(table, header, footer, out)
+        t3 = time.perf_counter()
+
+        result.update(
+            ok=True, out=None if opts["dry_run"] else out, rows=len(table),
+            matched=len(table) if rows is None else len(rows), affected=affected,
+            changed=changed, issues=len(table.issues), problems=_count_problems(table),
+            parse_ms=(t1 - t0) * 1000, apply_ms=(t2 - t1) * 1000, save_ms=(t3 - t2) * 1000,
+        )
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+def _print_batch_result(res, as_json):
+    if as_json:
+        print(json.dumps(res, ensure_ascii=False), flush=True)
+    elif res["ok"]:
+        print(f"ok    {res['file']}: {res['rows']} filas, {res['matched']} filtradas, "
+              f"{res['affected']} ajustadas, {res['changed']} modificadas, "
+              f"{res['problems']} problemas | "
+              f"parse {res['parse_ms']:.1f} ms, aplicar {res['apply_ms']:.1f} ms, "
+              f"guardar {res['save_ms']:.1f} ms", flush=True)
+    else:
+        print(f"ERROR {res['file']}: {res['error']}", flush=True)
+
+def cmd_batch(args):
+    if not args.in_place and not args.out_dir and not args.dry_run:
+        print("Indica --in-place, --out-dir DIR o --dry-run", file=sys.stderr)
+        return 2
+    if args.formula:
+        try:
+            Formula(args.formula)
+        except FormulaError as e:
+            print(f"Fórmula inválida: {e}", file=sys.stderr)
+            return 2
+    elif args.pct is None or args.cols is None:
+        print("Indica --pct y --cols, o --formula", file=sys.stderr)
+        return 2
+    elif not math.isfinite(1 + args.pct / 100.0):
+        print(f"--pct no válido: {args.pct}", file=sys.stderr)
+        return 2
+    if args.where:
+        try:
+            parse_query(args.where)
+        except QueryError as e:
+            print(f"Filtro inválido: {e}", file=sys.stderr)
+            return 2
+    if args.out_dir:
+        names = [os.path.basename(p) for p in args.files]
+        if len(set(names)) != len(names):
+            print("--out-dir: hay archivos con el mismo nombre; procésalos por separado", file=sys.stderr)
+            return 2
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    opts = {"pct": args.pct, "cols": args.cols, "where": args.where,
+            "formula": args.formula, "rounding": args.round, "min": args.min, "max": args.max,
+            "out_dir": args.out_dir, "dry_run": args.dry_run}
+    start = time.perf_counter()
+    failed = 0
+    if args.jobs == 1 or len(args.files) == 1:
+        results = (_batch_one(p, opts) for p in args.files)
+        for res in results:
+            failed += not res["ok"]
+            _print_batch_result(res, args.json)
+    else:
+        from concurrent.futures import ProcessPoolExecutor  # importa multiprocessing: solo aquí
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futures = [pool.submit(_batch_one, p, opts) for p in args.files]
+            for fut in as_completed(futures):
+                res = fut.result()
+                failed += not res["ok"]
+                _print_batch_result(res, args.json)
+    if not args.json:
+        print(f"{len(args.files) - failed}/{len(args.files)} archivos en {time.perf_counter() - start:.2f} s")
+    return 1 if failed else 0
+
+def cmd_diff(args):
+    try:
+        header, mine, footer = load_file(args.mine)
+        theirs = load_file(args.theirs)[1]
+    except OSError as e:
+        print(f"No se pudo leer: {e}", file=sys.stderr)
+        return 2
+    start = time.perf_counter()
+    entries = diff_tables(mine, theirs)
+    elapsed = time.perf_counter() - start
+    for e in entries:
+        if args.json:
+            print(json.dumps({"index": e.key, "kind": e.kind, "cells": {COLUMNS[ci]: [old, new] for ci, old, new in e.cells}},
+                             ensure_ascii=False))
+        elif e.kind == "changed":
+            cells = ", ".join(f"{COLUMNS[ci]} {old} -> {new}" for ci, old, new in e.cells)
+            print(f"~ [{e.key}] {mine.cell(e.row_a, NAME_COL)}: {cells}")
+        elif e.kind == "added":
+            print(f"+ [{e.key}] {theirs.cell(e.row_b, NAME_COL)}")
+        else:
+            print(f"- [{e.key}] {mine.cell(e.row_a, NAME_COL)}")
+    if not args.json:
+        print(f"{diff_summary(entries)} en {elapsed * 1000:.1f} ms")
+    if args.merge:
+        picks = [(e, None) for e in entries if e.kind in args.kinds]
+        merge_diff(mine, theirs, picks)
+        save_file(mine, header, footer, args.merge)
+        if not args.json:
+            print(f"{len(picks)} cambios aplicados sobre '{args.mine}' -> '{args.merge}'")
+    return 1 if entries else 0
+
+def _json_number(v):
+    return v if math.isfinite(v) else None  # JSON no tiene infinito
+
+def cmd_analyze(args):
+    try:
+        profiles = load_profiles(args.profiles) if args.profiles else list(DEFAULT_PROFILES)
+    except (OSError, ValueError) as e:
+        print(f"No se pudieron leer los perfiles: {e}", file=sys.stderr)
+        return 2
+    try:
+        table = load_file(args.file)[1]
+    except OSError as e:
+        print(f"No se pudo leer: {e}", file=sys.stderr)
+        return 2
+    start = time.perf_counter()
+    analysis = BalanceAnalysis(table, profiles)
+    summaries = analysis.summaries()
+    elapsed = time.perf_counter() - start
+    outliers = analysis.all_outliers()[:args.outliers]
+    if args.json:
+        print(json.dumps({
+            "stats": {COLUMNS[ci]: {"count": s.count, "min": s.min, "max": s.max, "mean": s.mean, "stdev": s.stdev,
+                                    "percentiles": s.percentiles}
+                      for ci, s in analysis.stats.items() if s is not None},
+            "curves": {COLUMNS[ci]: [p._asdict() for p in points] for ci, points in analysis.curves.items()},
+            "profiles": {name: {k: _json_number(v) for k, v in s.items()} for name, s in summaries.items()},
+            "outliers": [{"index": table.cell(o.row, INDEX_COL), "name": table.cell(o.row, NAME_COL),
+                          "column": COLUMNS[o.col], "value": o.value, "expected": o.expected, "z": o.z}
+                         for o in outliers],
+        }, ensure_ascii=False))
+        return 0
+    print(f"{'Columna':<14}{'mín':>10}{'p50':>10}{'p95':>10}{'máx':>10}{'media':>10}")
+    for ci, s in analysis.stats.items():
+        if s is not None:
+            print(f"{COLUMNS[ci]:<14}" + "".join(f"{format_number(v):>10}" for v in (
+                s.min, s.percentiles[50], s.percentiles[95], s.max, s.mean)))
+    print()
+    for name, s in summaries.items():
+        if s["monsters"]:
+            print(f"{name}: TTK mediano {format_number(s['ttk_median'])} s (p95 {format_number(s['ttk_p95'])} s), "
+                  f"daño recibido {format_number(s['taken_median'])}, muere con {s['deaths']} monsters, "
+                  f"botín/min {format_number(s['drop_per_min_mean'])}")
+    if outliers:
+        print()
+    for o in outliers:
+        print(f"! [{table.cell(o.row, INDEX_COL)}] {table.cell(o.row, NAME_COL)} (Level {table.cell(o.row, LEVEL_COL)}): "
+              f"{COLUMNS[o.col]} {format_number(o.value)}, media del tramo {format_number(o.expected)} (z {o.z:+.1f})")
+    print(f"{table.live_count()} monsters analizados en {elapsed * 1000:.1f} ms")
+    return 0
+
+def parse_kind_list(text):
+    kinds = [k.strip() for k in text.split(",") if k.strip()]
+    for k in kinds:
+        if k not in DIFF_KINDS:
+            raise argparse.ArgumentTypeError(f"tipo no válido: '{k}' (usa {', '.join(DIFF_KINDS)})")
+    return kinds
+
+def _print_bench_size(n, ops):
+    print(f"-- {n} filas --", flush=True)
+    for name, secs in ops.items():
+        print(f"  {name:<22}{secs * 1000:>10.2f} ms", flush=True)
+
+def cmd_bench(args):
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"No se pudo leer la referencia: {e}", file=sys.stderr)
+            return 2
+    report = None if args.quiet else _print_bench_size
+    data = run_benchmarks(args.sizes, args.repeat, report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        if not args.quiet:
+            print(f"Resultados en '{args.json}'")
+    elif args.quiet:
+        print(json.dumps(data))
+    if baseline is None:
+        return 0
+    worse = compare_benchmarks(data, baseline, args.threshold)
+    for size, name, before, now, pct in worse:
+        print(f"PEOR  {size} filas {name}: {before * 1000:.2f} -> {now * 1000:.2f} ms (+{pct:.0f}%)")
+    if not worse:
+        print(f"Sin empeoramientos mayores al {args.threshold:g}% respecto a '{args.baseline}'")
+    return 1 if worse else 0
+
+def parse_size_list(text):
+    try:
+        sizes = [int(s.replace("_", "").lower().replace("k", "000")) for s in text.split(",") if s.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"tamaños no válidos: '{text}' (ej: 1k,10k,100k)") from None
+    if not sizes or min(sizes) < 1:
+        raise argparse.ArgumentTypeError(f"tamaños no válidos: '{text}'")
+    return sizes
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="Monster Editor - herramientas sin ventana")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("batch", help="aplica porcentajes o fórmulas a uno o varios Monster.txt en paralelo")
+    p.add_argument("files", nargs="+", help="archivos Monster.txt")
+    p.add_argument("--pct", type=float, help="porcentaje (ej: 20 para +20%%, -10 para -10%%)")
+    p.add_argument("--cols", type=parse_column_list,
+                   help="columnas separadas por coma (ej: MaxLife,Defense) o 'all'")
+    p.add_argument("--formula", help="en lugar de --pct/--cols, ej: \"MaxLife = Level**2 * 12 + 100; Defense *= 1.1\"")
+    p.add_argument("--round", choices=list(ROUNDING_MODES), default="redondear", help="redondeo de --formula")
+    p.add_argument("--min", type=int, help="valor mínimo de los resultados de --formula")
+    p.add_argument("--max", type=int, help="valor máximo de los resultados de --formula")
+    p.add_argument("--where", default="", help="filtro de filas, ej: \"Level>=80 AND AttackType==2\"")
+    dest = p.add_mutually_exclusive_group()
+    dest.add_argument("--in-place", action="store_true", help="sobrescribe cada archivo (guardado atómico)")
+    dest.add_argument("--out-dir", help="escribe los resultados en esta carpeta")
+    p.add_argument("--dry-run", action="store_true", help="no escribe nada, solo informa")
+    p.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="procesos en paralelo")
+    p.add_argument("--json", action="store_true", help="una línea JSON por archivo")
+    p.set_defaults(func=cmd_batch)
+
+    p = sub.add_parser("diff", help="compara dos Monster.txt por Index (sale con 1 si hay diferencias)")
+    p.add_argument("mine", help="archivo base")
+    p.add_argument("theirs", help="archivo con el que se compara")
+    p.add_argument("--json", action="store_true", help="una línea JSON por diferencia")
+    p.add_argument("--merge", metavar="SALIDA", help="escribe el archivo base con los cambios del otro aplicados")
+    p.add_argument("--kinds", type=parse_kind_list, default=list(DIFF_KINDS),
+                   help="qué cambios aplica --merge: changed,added,removed (por defecto todos)")
+    p.set_defaults(func=cmd_diff)
+
+    p = sub.add_parser("bench", help="mide parseo, guardado, búsqueda, porcentajes… sobre archivos sintéticos")
+    p.add_argument("--sizes", type=parse_size_list, default=list(BENCH_SIZES), help="filas por archivo (ej: 1k,10k,100k)")
+    p.add_argument("--repeat", type=int, default=3, help="repeticiones por operación (se toma la mejor)")
+    p.add_argument("--json", metavar="ARCHIVO", help="guarda los resultados en JSON")
+    p.add_argument("--baseline", metavar="ARCHIVO", help="JSON de una ejecución anterior para comparar (sale con 1 si algo empeora)")
+    p.add_argument("--threshold", type=float, default=10.0, help="%% de empeoramiento tolerado frente a --baseline")
+    p.add_argument("--quiet", action="store_true", help="sin tabla; sin --json imprime el JSON")
+    p.set_defaults(func=cmd_bench)
+
+    p = sub.add_parser("analyze", help="distribuciones, curvas por Level, atípicos y simulación de combate")
+    p.add_argument("file", help="archivo Monster.txt")
+    p.add_argument("--profiles", metavar="ARCHIVO.json", help="perfiles de personaje (por defecto Novato, Medio, Avanzado)")
+    p.add_argument("--outliers", type=int, default=20, help="atípicos a mostrar")
+    p.add_argument("--json", action="store_true", help="todo el análisis como un JSON")
+    p.set_defaults(func=cmd_analyze)
+    return parser
+
+CLI_COMMANDS = ("batch", "diff", "bench", "analyze")
+
+def run_cli(argv):
+    args = build_arg_parser().parse_args(argv)
+    return args.func(args)
 
 # ---------- RUN ----------
-if __name__ == "__main__":
+def build_gui_arg_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py", description=f"Monster Editor (comandos sin ventana: {', '.join(CLI_COMMANDS)})")
+    parser.add_argument("--metrics", action="store_true", help="activa las métricas de tiempos desde el inicio")
+    parser.add_argument("--trace", metavar="ARCHIVO.json", help="métricas + traza de la sesión, escrita al cerrar")
+    parser.add_argument("--profile", metavar="ARCHIVO.prof", help="perfil cProfile de la sesión, escrito al cerrar")
+    parser.add_argument("--startup-log", metavar="ARCHIVO", help="añade una línea JSON con los tiempos de arranque")
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in CLI_COMMANDS:
+        return run_cli(argv)
+    opts = build_gui_arg_parser().parse_args(argv)
+    METRICS.enabled = bool(opts.metrics or opts.trace)
+    METRICS.tracing = bool(opts.trace)
+    profiler = cProfile.Profile() if opts.profile else None
+    import ttkbootstrap as tb  # parchea ttk (bootstyle=...) antes de crear widgets
     app = tb.Window(themename="superhero")
-    MonsterEditorApp(app)
-    app.mainloop()
+    MonsterEditorApp(app, startup_log=opts.startup_log)
+    if profiler is not None:
+        profiler.enable()
+    try:
+        app.mainloop()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(opts.profile)
+        if opts.trace:
+            METRICS.dump(opts.trace)
+    return 0
+
+if __name__ == "__main__":
+    if getattr(sys, "frozen", False):
+        # en el ejecutable, los procesos de 'batch' vuelven a entrar por aquí
+        import multiprocessing
+        multiprocessing.freeze_support()
+    sys.exit(main())